@@ -1,98 +1,254 @@
 import streamlit as st
 import pandas as pd
 import sqlite3
-import hashlib
-import base64
-import uuid
-import secrets
-from datetime import datetime
+import math
+import os
+import logging
+import tempfile
+from datetime import datetime, timedelta
+from streamlit.errors import StreamlitAPIException
+
+from condominio.fotos import ler_foto, caminho_miniatura, tem_miniatura
+from condominio.datas import FORMATO_BANCO, FORMATO_EXIBICAO, formatar_data, calcular_tempo_finalizacao
+from condominio.consultas import STATUS_ABERTOS, TAMANHO_PAGINA, buscar_foto, versao_ocorrencias
+from condominio.busca import TAMANHO_PAGINA_BUSCA, buscar_ocorrencias, buscar_moradores
+from condominio.exportacao import FORMATOS, ocorrencias as exportar_ocorrencias, moradores as exportar_moradores
+from condominio.relatorios import tempos_resolucao, resumo_por, idade_fila, formatar_minutos
+from condominio.protocolos import formatar as formatar_protocolo, normalizar as normalizar_protocolo, protocolo_valido
+from condominio.notificacoes import Despachante, envio_do_ambiente
+from condominio.banco import Banco
+from condominio.configuracoes import Configuracoes, CHAVE_WHATSAPP, CHAVE_CATEGORIAS
+from condominio.servicos import Servicos, TIPOS_REGISTRO, OPCOES_STATUS
+from condominio.condominios import MAX_ABERTOS, Condominios
+from condominio.diagnostico import Diagnostico, CHAVE_LIMITE_LENTA, LIMITE_LENTA_MS, plano_consulta
+from condominio.fila import FilaAoVivo
+from condominio.arquivo import CHAVE_DIAS_ARQUIVAR, DIAS_ARQUIVAR
 
 # ====================== CONFIGURAÇÕES ======================
 DB_PATH = "condominio.db"
+NOTIFICACOES_PATH = "notificacoes.jsonl"
+CONSULTAS_LENTAS_PATH = "consultas_lentas.log"
+# A fila de atendimentos confere mudanças nesse intervalo, sem recarregar a página inteira
+INTERVALO_FILA_S = 10
+# Modo multicondomínio: com a variável definida, cada condomínio tem o próprio banco nessa
+# pasta e cada sessão escolhe o seu (também pela URL: ?condominio=identificador)
+CONDOMINIOS_PASTA = os.environ.get("CONDOMINIO_PASTA")
 
 # ====================== FUNÇÕES ======================
-def generate_salt() -> str:
-    return base64.b64encode(secrets.token_bytes(16)).decode()
+def intervalo_iso(periodo):
+    # Período do st.date_input (0, 1 ou 2 datas) como (desde, até exclusivo) em ISO
+    desde = periodo[0].isoformat() if len(periodo) > 0 else None
+    ate = (periodo[1] + timedelta(days=1)).isoformat() if len(periodo) > 1 else None
+    return desde, ate
+
+def ip_cliente():
+    # Chave do limite de tentativas por IP; None quando o Streamlit não informa
+    return getattr(st.context, "ip_address", None)
+
+def mostrar_foto(foto_hash, key):
+    # Miniatura pré-gerada; a foto original só é lida do disco quando pedida
+    if tem_miniatura(foto_hash):
+        with get_diagnostico().medir("foto: miniatura"):
+            st.image(caminho_miniatura(foto_hash))
+    if st.toggle("Ver foto original", key=f"foto_original_{key}"):
+        with get_diagnostico().medir("foto: original"):
+            conteudo = ler_foto(foto_hash)
+            if conteudo:
+                st.image(conteudo)
+        if not conteudo:
+            st.caption("Foto não encontrada.")
+
+def exibir_foto(protocolo, key):
+    # Listagens não trazem a foto: a referência só é buscada quando o usuário pede
+    if st.toggle("📷 Ver foto", key=f"foto_{key}"):
+        with get_banco().conexao() as conn:
+            foto_hash = buscar_foto(conn, protocolo)
+        if foto_hash:
+            mostrar_foto(foto_hash, key)
 
-def hash_password(plain: str, salt: str) -> str:
-    salt_bytes = base64.b64decode(salt)
-    dk = hashlib.pbkdf2_hmac("sha256", plain.encode("utf-8"), salt_bytes, 100_000)
-    return base64.b64encode(dk).decode()
+# ====================== BANCO ======================
+@st.cache_resource
+def log_consultas_lentas():
+    # Um handler por processo: as consultas lentas de todos os condomínios vão para CONSULTAS_LENTAS_PATH
+    handler = logging.FileHandler(CONSULTAS_LENTAS_PATH, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    logger = logging.getLogger("condominio.consultas_lentas")
+    logger.addHandler(handler)
+    logger.propagate = False
+
+def novo_diagnostico(condominio=None):
+    # Tempos de consultas e seções de um banco: cada condomínio vê só os seus, com o próprio limite
+    log_consultas_lentas()
+    return Diagnostico()
+
+@st.cache_resource
+def get_unico():
+    # Modo de um condomínio só: um pool, uma cópia da config e uma thread de despacho por processo
+    banco = Banco(DB_PATH, diagnostico=novo_diagnostico())
+    # Esquema antes do despachante; os reruns do Streamlit não tocam mais nele
+    Servicos(banco).inicializar()
+    # SMTP com as variáveis CONDOMINIO_SMTP_*; sem elas, só o arquivo NOTIFICACOES_PATH (com aviso no log)
+    despachante = Despachante(banco, envio_do_ambiente(NOTIFICACOES_PATH)).iniciar()
+    return Servicos(banco, Configuracoes(banco), despachante)
+
+@st.cache_resource
+def get_condominios():
+    # Condomínios abertos sob demanda; os menos usados são fechados
+    return Condominios(CONDOMINIOS_PASTA, diagnostico=novo_diagnostico,
+                       envio=lambda c: envio_do_ambiente(os.path.join(CONDOMINIOS_PASTA, f"{c}.{NOTIFICACOES_PATH}")))
+
+def get_servicos():
+    # As mesmas operações que a API HTTP (condominio.api) expõe, no condomínio da sessão
+    if CONDOMINIOS_PASTA:
+        return get_condominios().servicos(st.session_state.condominio)
+    return get_unico()
+
+def get_banco():
+    return get_servicos().banco
+
+def get_config():
+    # Cópia da tabela config; salvar() invalida na hora
+    return get_servicos().config
+
+def get_diagnostico():
+    return get_banco().diagnostico
+
+def versao_dados():
+    with get_banco().conexao() as conn:
+        return versao_ocorrencias(conn)
+
+# A versão entra na chave do cache: qualquer escrita em ocorrencias invalida o relatório.
+# O ttl só existe para a idade da fila, que muda com o relógio.
+# O condomínio só entra para separar os caches de cada banco.
+# Cada escrita gera uma chave nova: max_entries descarta as versões antigas (cerca de duas por
+# condomínio aberto) em vez de deixá-las na memória até o ttl.
+@st.cache_data(ttl=300, max_entries=2 * MAX_ABERTOS if CONDOMINIOS_PASTA else 2, show_spinner=False)
+def carregar_relatorio(condominio, versao):
+    with get_banco().conexao() as conn:
+        return tempos_resolucao(conn), idade_fila(conn)
+
+# ====================== FILA DE ATENDIMENTOS ======================
+# Só este trecho roda a cada INTERVALO_FILA_S: confere a versão dos dados (uma consulta) e,
+# se algo mudou, traz apenas os protocolos alterados para a página que está na tela
+def rerun_fila():
+    # Um clique na fila reroda só o fragmento; se ele veio num rerun completo, reroda a página
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+@st.fragment(run_every=INTERVALO_FILA_S)
+def fila_atendimentos(filtros):
+    cursores = st.session_state.fila_cursores
+    fila = st.session_state.get("fila_ao_vivo")
+    if fila is None or fila.filtros != filtros or fila.cursor != cursores[-1]:
+        fila = st.session_state.fila_ao_vivo = FilaAoVivo(filtros, cursores[-1])
+    with get_diagnostico().fragmento("Atendimentos (ao vivo)"):
+        get_servicos().atualizar_fila(fila)
+        contagem, df_pendentes, proximo_cursor = fila.contagem, fila.df, fila.proximo
+        total_fila = sum(contagem.values())
+
+        mcols = st.columns(len(STATUS_ABERTOS) + 1)
+        mcols[0].metric("Em aberto", total_fila)
+        for mcol, status_aberto in zip(mcols[1:], STATUS_ABERTOS):
+            mcol.metric(status_aberto, contagem.get(status_aberto, 0))
+
+        if total_fila == 0:
+            st.info("Não há atendimentos pendentes no momento.")
+        else:
+            # Formulário: os widgets não disparam rerun; tudo é gravado numa única transação ao aplicar
+            with st.form("acoes_em_massa"):
+                st.markdown("**Ações em massa**")
+                todos_do_filtro = st.checkbox(f"Todos os {total_fila} chamados do filtro atual")
+                selecionados = st.multiselect("Chamados desta página", df_pendentes["id"].tolist())
+                acol1, acol2 = st.columns(2)
+                with acol1:
+                    acao_massa = st.selectbox("Ação", OPCOES_STATUS + ["Excluir"])
+                with acol2:
+                    # Nem antes da abertura dos chamados da página nem no futuro; o resto é conferido por chamado
+                    abertura = pd.to_datetime(df_pendentes["data_envio"], errors="coerce").min()
+                    data_conclusao_massa = st.date_input("Data de conclusão (opcional)", value=None, format="DD/MM/YYYY",
+                                                         min_value=abertura.date() if pd.notna(abertura) else None,
+                                                         max_value=datetime.now().date())
+                confirmar_exclusao = st.checkbox("Confirmo a exclusão permanente dos selecionados")
+                aplicar_massa = st.form_submit_button("Aplicar", type="primary")
+
+            if aplicar_massa:
+                # "Todos do filtro" resolve os protocolos dentro da mesma transação da escrita
+                filtros_alvo = filtros if todos_do_filtro else None
+                if not todos_do_filtro and not selecionados:
+                    st.warning("Selecione ao menos um chamado.")
+                elif acao_massa == "Excluir" and not confirmar_exclusao:
+                    st.warning("Marque a confirmação para excluir os chamados selecionados.")
+                else:
+                    if acao_massa == "Excluir":
+                        alterados = get_servicos().excluir(selecionados, st.session_state.user, filtros_alvo)
+                    else:
+                        quando = None
+                        if data_conclusao_massa:
+                            quando = datetime.combine(data_conclusao_massa, datetime.now().time()).strftime(FORMATO_BANCO)
+                        alterados, recusados = get_servicos().alterar_status(selecionados, acao_massa,
+                                                                             st.session_state.user, quando, filtros_alvo)
+                        if recusados:
+                            st.warning(f"{len(recusados)} chamado(s) aberto(s) depois da data de conclusão ficaram "
+                                       f"como estavam: {', '.join(recusados[:20])}")
+                    st.success(f"{alterados} chamado(s) atualizado(s).")
+                    rerun_fila()
+
+            if df_pendentes.empty:
+                st.caption("Nenhum chamado nesta página.")
+            for idx, row in df_pendentes.iterrows():
+                cor_emoji = "🟡" if row["status"] == "Pendente" else "🔴"
+                with st.expander(f"{cor_emoji} {row['id']} - {row['tipo_registro']}"):
+                    st.write(f"**Criado por:** {row['criado_por']}")
+                    st.write(f"**Local:** {row['categoria']} ({row['local_detalhado']})")
+                    st.write(f"**Descrição:** {row['descricao']}")
+                    st.caption(f"Aberto em: {formatar_data(row['data_envio'])}")
+                    if row["tem_foto"]:
+                        exibir_foto(row["id"], row["id"])
 
-def verify_password(plain: str, stored_hash: str, stored_salt: str) -> bool:
-    return hash_password(plain, stored_salt) == stored_hash
+                    col1, col2 = st.columns([3, 1])
 
-def calcular_tempo_finalizacao(inicio_str, fim_str):
-    try:
-        fmt = "%d/%m/%Y %H:%M"
-        inicio = datetime.strptime(inicio_str, fmt)
-        fim = datetime.strptime(fim_str, fmt)
-        delta = fim - inicio
-        dias = delta.days
-        horas = delta.seconds // 3600
-        minutos = (delta.seconds // 60) % 60
-        partes = []
-        if dias: partes.append(f"{dias}d")
-        if horas: partes.append(f"{horas}h")
-        if minutos or not partes: partes.append(f"{minutos}min")
-        return " ".join(partes)
-    except:
-        return "N/A"
+                    with col1:
+                        indice_atual = OPCOES_STATUS.index(row["status"]) if row["status"] in OPCOES_STATUS else 0
 
-# ====================== BANCO ======================
-def get_conn():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
-
-def init_db():
-    conn = get_conn()
-    cur = conn.cursor()
-
-    cur.execute("""CREATE TABLE IF NOT EXISTS usuarios (
-        username TEXT PRIMARY KEY,
-        password_hash TEXT NOT NULL,
-        salt TEXT NOT NULL,
-        role TEXT NOT NULL,
-        nome_completo TEXT,
-        apartamento TEXT,
-        email TEXT UNIQUE,
-        telefone TEXT,
-        data_cadastro TEXT DEFAULT (datetime('now','localtime')),
-        ativo INTEGER DEFAULT 1
-    )""")
-
-    cur.execute("""CREATE TABLE IF NOT EXISTS ocorrencias (
-        id TEXT PRIMARY KEY,
-        tipo_registro TEXT,
-        categoria TEXT NOT NULL,
-        local_detalhado TEXT,
-        descricao TEXT NOT NULL,
-        foto_base64 TEXT,
-        status TEXT DEFAULT 'Pendente',
-        data_envio TEXT,
-        data_conclusao TEXT,
-        criado_por TEXT DEFAULT 'Anônimo'
-    )""")
-
-    cur.execute("""CREATE TABLE IF NOT EXISTS config (
-        chave TEXT PRIMARY KEY,
-        valor TEXT
-    )""")
-
-    # Admin padrão
-    if not cur.execute("SELECT 1 FROM usuarios WHERE username = 'admin'").fetchone():
-        salt = generate_salt()
-        hash_pw = hash_password("admin123", salt)
-        cur.execute("""
-            INSERT INTO usuarios (username, password_hash, salt, role, nome_completo, apartamento)
-            VALUES (?, ?, ?, 'admin', 'Síndico Principal', 'Admin')
-        """, ("admin", hash_pw, salt))
-
-    cur.execute("INSERT OR IGNORE INTO config (chave, valor) VALUES ('whatsapp_urgente_link', '')")
-
-    conn.commit()
-    conn.close()
-
-init_db()
+                        novo_status = st.selectbox(
+                            "Alterar status",
+                            options=OPCOES_STATUS,
+                            index=indice_atual,
+                            key=f"status_select_{row['id']}"
+                        )
+
+                    with col2:
+                        if st.button("Salvar", key=f"salvar_{row['id']}", type="primary"):
+                            get_servicos().alterar_status([row["id"]], novo_status, st.session_state.user)
+
+                            st.success(f"Status alterado para **{novo_status}**")
+                            rerun_fila()
+
+                        if st.button("Excluir", key=f"delete_{row['id']}", help="Excluir este chamado"):
+                            if st.session_state.get(f"confirm_delete_{row['id']}", False):
+                                get_servicos().excluir([row["id"]], st.session_state.user)
+                                st.success(f"Chamado {row['id']} excluído.")
+                                rerun_fila()
+                            else:
+                                st.session_state[f"confirm_delete_{row['id']}"] = True
+                                st.warning("Clique novamente em Excluir para confirmar a exclusão permanente.")
+
+            nav1, nav2, nav3 = st.columns([1, 2, 1])
+            with nav1:
+                if st.button("← Anterior", key="fila_anterior", disabled=len(cursores) == 1):
+                    cursores.pop()
+                    rerun_fila()
+            with nav2:
+                st.caption(f"Página {len(cursores)} de {math.ceil(total_fila / TAMANHO_PAGINA)}")
+            with nav3:
+                if st.button("Próxima →", key="fila_proxima", disabled=proximo_cursor is None):
+                    cursores.append(proximo_cursor)
+                    rerun_fila()
+
+if not CONDOMINIOS_PASTA:
+    get_unico()
 
 # ====================== INTERFACE ======================
 st.set_page_config(page_title="Condomínio Pro", layout="wide", page_icon="🏢")
@@ -105,13 +261,32 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+st.sidebar.title("🏢 Condomínio Pro")
+
+if CONDOMINIOS_PASTA:
+    condominios = get_condominios().listar()
+    if not condominios:
+        st.error("Nenhum condomínio cadastrado. Use: python -m condominio.condominios PASTA criar IDENTIFICADOR NOME")
+        st.stop()
+    nomes_condominios = dict(condominios)
+    if "condominio_escolhido" not in st.session_state:
+        pedido = st.query_params.get("condominio")
+        st.session_state.condominio_escolhido = pedido if pedido in nomes_condominios else condominios[0][0]
+    escolhido = st.sidebar.selectbox("Condomínio", list(nomes_condominios), format_func=nomes_condominios.get,
+                                     key="condominio_escolhido")
+    if escolhido != st.session_state.get("condominio"):
+        # Login e papel valem só dentro de um condomínio: trocar de prédio começa uma sessão nova
+        for k in list(st.session_state.keys()):
+            if k != "condominio_escolhido":
+                del st.session_state[k]
+        st.session_state.condominio = escolhido
+    st.query_params["condominio"] = escolhido
+
 # Sessão
 for key in ["user", "role", "nome", "apartamento"]:
     if key not in st.session_state:
         st.session_state[key] = None
 
-st.sidebar.title("🏢 Condomínio Pro")
-
 if st.session_state.user is None:
     menu_options = ["📝 Abrir Registro (Anônimo)", "🔍 Consultar Protocolo", "👤 Login / Cadastro"]
 else:
@@ -122,6 +297,10 @@ else:
 
 menu = st.sidebar.radio("Navegação", menu_options)
 
+diagnostico = get_diagnostico()
+diagnostico.iniciar_rerun(f"{st.session_state.condominio}: {menu}" if CONDOMINIOS_PASTA else menu)
+diagnostico.limite_ms = float(get_config().obter(CHAVE_LIMITE_LENTA, LIMITE_LENTA_MS))
+
 if menu == "🚪 Sair":
     for k in list(st.session_state.keys()):
         del st.session_state[k]
@@ -133,18 +312,13 @@ if menu == "👤 Login / Cadastro":
     tab_login, tab_cad = st.tabs(["Entrar", "Cadastrar"])
 
     with tab_login:
+        diagnostico.secao("Entrar")
         usr = st.text_input("Usuário / E-mail / Apartamento")
         pwd = st.text_input("Senha", type="password")
         if st.button("Entrar", type="primary"):
-            conn = get_conn()
-            row = conn.execute("""
-                SELECT username, password_hash, salt, role, nome_completo, apartamento, ativo
-                FROM usuarios
-                WHERE (username = ? OR email = ? OR apartamento = ?) AND ativo = 1
-            """, (usr, usr, usr)).fetchone()
-            conn.close()
-
-            if row and verify_password(pwd, row[1], row[2]):
+            row, espera = get_servicos().autenticar(usr, pwd, ip_cliente())
+
+            if row:
                 st.session_state.user = row[0]
                 st.session_state.role = row[3]
                 st.session_state.nome = row[4]
@@ -159,10 +333,13 @@ if menu == "👤 Login / Cadastro":
                         Painel Administrativo → Minha Conta
                     """)
                 st.rerun()
+            elif espera:
+                st.error(f"Muitas tentativas de login. Tente novamente em {espera} segundos.")
             else:
                 st.error("Credenciais inválidas ou usuário inativo.")
 
     with tab_cad:
+        diagnostico.secao("Cadastrar")
         col1, col2 = st.columns(2)
         with col1:
             nome = st.text_input("Nome completo *")
@@ -175,25 +352,14 @@ if menu == "👤 Login / Cadastro":
         senha2 = st.text_input("Confirme a senha *", type="password")
 
         if st.button("Cadastrar", type="primary"):
-            if not all([nome, apto, email, usuario, senha1]):
-                st.error("Preencha os campos obrigatórios")
-            elif senha1 != senha2:
+            if senha1 != senha2:
                 st.error("As senhas não coincidem")
             else:
-                salt = generate_salt()
-                hash_pw = hash_password(senha1, salt)
                 try:
-                    conn = get_conn()
-                    conn.execute("""
-                        INSERT INTO usuarios
-                        (username, password_hash, salt, role, nome_completo, apartamento, email, telefone)
-                        VALUES (?, ?, ?, 'morador', ?, ?, ?, ?)
-                    """, (usuario, hash_pw, salt, nome, apto, email, tel or None))
-                    conn.commit()
-                    conn.close()
+                    get_servicos().cadastrar_morador(usuario, senha1, nome, apto, email, tel)
                     st.success("Cadastro realizado! Agora faça login.")
-                except sqlite3.IntegrityError:
-                    st.error("Usuário, e-mail ou apartamento já cadastrado.")
+                except ValueError as e:
+                    st.error(str(e))
 
 # ====================== ABRIR REGISTRO ======================
 if menu.startswith("📝 Abrir Registro"):
@@ -205,42 +371,26 @@ if menu.startswith("📝 Abrir Registro"):
     if logado:
         st.info(f"Registrando como: **{st.session_state.nome}**")
 
-    tipo = st.radio("Tipo de registro", ["Abertura de Chamado", "Denúncia"], horizontal=True)
+    tipo = st.radio("Tipo de registro", TIPOS_REGISTRO, horizontal=True)
     if tipo == "Denúncia":
         st.info("Este registro é anônimo")
 
-    categoria = st.selectbox("Área", ["Corredor", "Garagem", "Jardim", "Academia", "Elevador", "Piscina", "Outros"])
+    categoria = st.selectbox("Área", get_config().categorias())
     local = st.text_input("Localização específica", value=prefill_local)
     descricao = st.text_area("Descrição do problema")
     foto = st.file_uploader("Foto (opcional)", type=["jpg", "jpeg", "png"])
 
     if st.button("Registrar", type="primary"):
-        if not descricao.strip():
-            st.error("A descrição é obrigatória")
+        try:
+            protocolo = get_servicos().abrir(tipo, categoria, local, descricao,
+                                             foto.getvalue() if foto is not None else None,
+                                             st.session_state.user if logado else None)
+        except ValueError as e:
+            st.error(str(e))
         else:
-            protocolo = str(uuid.uuid4())[:8].upper()
-            foto_b64 = None
-            if foto is not None:
-                foto_b64 = base64.b64encode(foto.getvalue()).decode("utf-8")
-
-            criado_por = st.session_state.user if logado else "Anônimo"
-            data_atual = datetime.now().strftime("%d/%m/%Y %H:%M")
-
-            conn = get_conn()
-            conn.execute("""
-                INSERT INTO ocorrencias
-                (id, tipo_registro, categoria, local_detalhado, descricao, foto_base64, data_envio, criado_por)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (protocolo, tipo, categoria, local, descricao, foto_b64, data_atual, criado_por))
-            conn.commit()
-            conn.close()
-
-            st.success(f"Registro enviado com sucesso!\n**Protocolo:** {protocolo}")
-
-            conn = get_conn()
-            link_row = conn.execute("SELECT valor FROM config WHERE chave = 'whatsapp_urgente_link'").fetchone()
-            conn.close()
-            link_grupo = link_row[0].strip() if link_row and link_row[0] else None
+            st.success(f"Registro enviado com sucesso!\n**Protocolo:** {formatar_protocolo(protocolo)}")
+
+            link_grupo = get_config().obter(CHAVE_WHATSAPP, "").strip() or None
 
             if logado and link_grupo:
                 st.markdown(f"""
@@ -259,15 +409,13 @@ if menu.startswith("📝 Abrir Registro"):
 # ====================== CONSULTAR PROTOCOLO ======================
 elif menu == "🔍 Consultar Protocolo":
     st.header("Consultar Protocolo")
-    prot = st.text_input("Digite o protocolo", "").upper().strip()
+    prot = normalizar_protocolo(st.text_input("Digite o protocolo", ""))
 
     if prot:
-        conn = get_conn()
-        registro = conn.execute("SELECT * FROM ocorrencias WHERE id = ?", (prot,)).fetchone()
-        conn.close()
+        registro = get_servicos().consultar(prot)
 
         if registro:
-            status = registro[6]
+            status = registro["status"]
             if status == "Pendente":
                 st.warning(f"Status atual: **{status}** 🟡")
             elif status == "Em Manutenção":
@@ -277,12 +425,20 @@ elif menu == "🔍 Consultar Protocolo":
             else:
                 st.info(f"Status: {status}")
 
-            st.write("**Descrição:**", registro[4])
-            st.caption(f"Aberto em: {registro[7]}")
-            if registro[8]:
-                st.write("**Tempo de resolução:**", calcular_tempo_finalizacao(registro[7], registro[8]))
-            if registro[5]:
-                st.image(base64.b64decode(registro[5]))
+            st.write("**Descrição:**", registro["descricao"])
+            st.caption(f"Aberto em: {formatar_data(registro['data_envio'])}")
+            if registro.get("arquivado"):
+                st.caption("Chamado antigo, consultado no arquivo.")
+            if registro["data_conclusao"]:
+                st.write("**Tempo de resolução:**", calcular_tempo_finalizacao(registro["data_envio"], registro["data_conclusao"]))
+            with st.expander("Histórico"):
+                for status_novo, alterado_em, _ in registro["historico"]:
+                    st.write(f"{formatar_data(alterado_em)} — {status_novo}")
+            if registro["foto_hash"]:
+                mostrar_foto(registro["foto_hash"], registro["id"])
+        elif not protocolo_valido(prot):
+            # Protocolos antigos (hexadecimais) não têm dígito verificador: o aviso só vem se não achou
+            st.error("Protocolo não encontrado. Confira a digitação: o protocolo informado não é válido.")
         else:
             st.error("Protocolo não encontrado.")
 
@@ -290,114 +446,129 @@ elif menu == "🔍 Consultar Protocolo":
 elif menu == "📊 Painel Administrativo":
     st.header("Painel Administrativo")
 
-    tabs = st.tabs(["Atendimentos", "Relatórios", "Novo Administrador", "Minha Conta", "Usuários Cadastrados", "Configurações"])
+    tabs = st.tabs(["Atendimentos", "Relatórios", "Busca", "Novo Administrador", "Minha Conta", "Usuários Cadastrados", "Configurações", "Exportar", "Diagnóstico"])
 
     with tabs[0]:  # Atendimentos
-        conn = get_conn()
-        df_pendentes = pd.read_sql_query("""
-            SELECT * FROM ocorrencias
-            WHERE status != 'Concluído'
-            ORDER BY data_envio DESC
-        """, conn)
-        conn.close()
-
-        if df_pendentes.empty:
-            st.info("Não há atendimentos pendentes no momento.")
-        else:
-            for idx, row in df_pendentes.iterrows():
-                cor_emoji = "🟡" if row["status"] == "Pendente" else "🔴"
-                with st.expander(f"{cor_emoji} {row['id']} - {row['tipo_registro']}"):
-                    st.write(f"**Criado por:** {row['criado_por']}")
-                    st.write(f"**Local:** {row['categoria']} ({row['local_detalhado']})")
-                    st.write(f"**Descrição:** {row['descricao']}")
-                    if row["foto_base64"]:
-                        st.image(base64.b64decode(row["foto_base64"]))
-
-                    col1, col2 = st.columns([3, 1])
-
-                    with col1:
-                        opcoes_status = ["Pendente", "Em Manutenção", "Concluído"]
-                        indice_atual = opcoes_status.index(row["status"]) if row["status"] in opcoes_status else 0
-
-                        novo_status = st.selectbox(
-                            "Alterar status",
-                            options=opcoes_status,
-                            index=indice_atual,
-                            key=f"status_select_{row['id']}"
-                        )
-
-                    with col2:
-                        if st.button("Salvar", key=f"salvar_{row['id']}", type="primary"):
-                            data_conclusao = None
-                            if novo_status == "Concluído":
-                                data_conclusao = datetime.now().strftime("%d/%m/%Y %H:%M")
-
-                            conn = get_conn()
-                            conn.execute("""
-                                UPDATE ocorrencias
-                                SET status = ?, data_conclusao = ?
-                                WHERE id = ?
-                            """, (novo_status, data_conclusao, row["id"]))
-                            conn.commit()
-                            conn.close()
-
-                            st.success(f"Status alterado para **{novo_status}**")
-                            st.rerun()
-
-                        if st.button("Excluir", key=f"delete_{row['id']}", help="Excluir este chamado"):
-                            if st.session_state.get(f"confirm_delete_{row['id']}", False):
-                                conn = get_conn()
-                                conn.execute("DELETE FROM ocorrencias WHERE id = ?", (row['id'],))
-                                conn.commit()
-                                conn.close()
-                                st.success(f"Chamado {row['id']} excluído.")
-                                st.rerun()
-                            else:
-                                st.session_state[f"confirm_delete_{row['id']}"] = True
-                                st.warning("Clique novamente em Excluir para confirmar a exclusão permanente.")
+        diagnostico.secao("Atendimentos")
+        # Filtros e contagens resolvidos no SQL; só a página atual da fila é renderizada
+        fcol1, fcol2, fcol3, fcol4 = st.columns(4)
+        with fcol1:
+            filtro_status = st.multiselect("Status", list(STATUS_ABERTOS), key="fila_status")
+        with fcol2:
+            filtro_categoria = st.multiselect("Área", get_config().categorias(), key="fila_categoria")
+        with fcol3:
+            filtro_tipo = st.multiselect("Tipo", TIPOS_REGISTRO, key="fila_tipo")
+        with fcol4:
+            periodo = st.date_input("Período", value=(), format="DD/MM/YYYY", key="fila_periodo")
+
+        desde, ate = intervalo_iso(periodo)
+        filtros = {
+            "status": filtro_status,
+            "categoria": filtro_categoria,
+            "tipo_registro": filtro_tipo,
+            "desde": desde,
+            "ate": ate,
+        }
+        # Pilha de cursores: o topo é o início da página atual; filtros novos voltam à primeira
+        if st.session_state.get("fila_filtros") != filtros:
+            st.session_state.fila_filtros = filtros
+            st.session_state.fila_cursores = [None]
+        fila_atendimentos(filtros)
 
     with tabs[1]:
+        diagnostico.secao("Relatórios")
         st.subheader("Relatório de Concluídos")
-        conn = get_conn()
-        df_concluidos = pd.read_sql_query("SELECT * FROM ocorrencias WHERE status = 'Concluído'", conn)
-        conn.close()
+        df_concluidos, df_idade = carregar_relatorio(st.session_state.get("condominio"), versao_dados())
+
+        st.markdown("**Idade dos chamados em aberto**")
+        for icol, (faixa, chamados) in zip(st.columns(len(df_idade)), df_idade["chamados"].items()):
+            icol.metric(faixa, int(chamados))
 
         if df_concluidos.empty:
             st.info("Ainda não há registros concluídos.")
         else:
-            df_concluidos["Tempo de resolução"] = df_concluidos.apply(
-                lambda r: calcular_tempo_finalizacao(r["data_envio"], r["data_conclusao"]), axis=1
-            )
+            mcol1, mcol2, mcol3 = st.columns(3)
+            mcol1.metric("Concluídos", len(df_concluidos))
+            mcol2.metric("Mediana de resolução", formatar_minutos(df_concluidos["minutos"].median()))
+            mcol3.metric("p90 de resolução", formatar_minutos(df_concluidos["minutos"].quantile(0.9)))
+
+            rcol1, rcol2 = st.columns(2)
+            for rcol, coluna, titulo in ((rcol1, "categoria", "Área"), (rcol2, "mes", "Mês")):
+                resumo = resumo_por(df_concluidos, coluna)
+                for estatistica in ("mediana", "p90"):
+                    resumo[estatistica] = resumo[estatistica].map(formatar_minutos)
+                rcol.dataframe(
+                    resumo.rename(columns={coluna: titulo, "chamados": "Chamados", "mediana": "Mediana", "p90": "p90"}),
+                    use_container_width=True,
+                    hide_index=True
+                )
+
+            df_tabela = df_concluidos.copy()
+            df_tabela["Tempo de resolução"] = df_tabela["minutos"].map(formatar_minutos)
+            for coluna in ("data_envio", "data_conclusao"):
+                df_tabela[coluna] = pd.to_datetime(df_tabela[coluna]).dt.strftime(FORMATO_EXIBICAO)
             st.dataframe(
-                df_concluidos[["id", "tipo_registro", "categoria", "data_envio", "data_conclusao", "Tempo de resolução", "criado_por"]],
+                df_tabela[["id", "tipo_registro", "categoria", "data_envio", "data_conclusao", "Tempo de resolução", "criado_por"]],
                 use_container_width=True,
                 hide_index=True
             )
 
-    with tabs[2]:
+    with tabs[2]:  # Busca
+        diagnostico.secao("Busca")
+        st.subheader("Busca")
+        alvo_busca = st.radio("Buscar em", ["Chamados", "Moradores"], horizontal=True, key="busca_alvo")
+        texto_busca = st.text_input("Termos", key="busca_texto", placeholder="Ex.: vazamento garagem")
+
+        # Nova busca volta para a primeira página
+        if st.session_state.get("busca_chave") != (alvo_busca, texto_busca):
+            st.session_state.busca_chave = (alvo_busca, texto_busca)
+            st.session_state.busca_pagina = 0
+        pagina_busca = st.session_state.busca_pagina
+
+        if texto_busca.strip():
+            with get_banco().conexao() as conn:
+                if alvo_busca == "Chamados":
+                    df_busca, total_busca = buscar_ocorrencias(conn, texto_busca, pagina_busca)
+                else:
+                    df_busca, total_busca = buscar_moradores(conn, texto_busca, pagina_busca)
+
+            if total_busca == 0:
+                st.info("Nenhum resultado encontrado.")
+            else:
+                st.caption(f"{total_busca} resultado(s), mais relevantes primeiro")
+                for coluna in ("data_envio", "data_cadastro"):
+                    if coluna in df_busca:
+                        df_busca[coluna] = df_busca[coluna].map(formatar_data)
+                st.dataframe(df_busca, use_container_width=True, hide_index=True)
+
+                bnav1, bnav2, bnav3 = st.columns([1, 2, 1])
+                with bnav1:
+                    if st.button("← Anterior", key="busca_anterior", disabled=pagina_busca == 0):
+                        st.session_state.busca_pagina -= 1
+                        st.rerun()
+                with bnav2:
+                    st.caption(f"Página {pagina_busca + 1} de {math.ceil(total_busca / TAMANHO_PAGINA_BUSCA)}")
+                with bnav3:
+                    ultima_pagina = (pagina_busca + 1) * TAMANHO_PAGINA_BUSCA >= total_busca
+                    if st.button("Próxima →", key="busca_proxima", disabled=ultima_pagina):
+                        st.session_state.busca_pagina += 1
+                        st.rerun()
+
+    with tabs[3]:
+        diagnostico.secao("Novo Administrador")
         st.subheader("Cadastrar novo administrador")
         novo_user = st.text_input("Nome de usuário")
         nova_senha = st.text_input("Senha", type="password")
 
         if st.button("Criar"):
-            if not novo_user or not nova_senha:
-                st.error("Preencha usuário e senha")
-            else:
-                salt = generate_salt()
-                hash_senha = hash_password(nova_senha, salt)
-                try:
-                    conn = get_conn()
-                    conn.execute("""
-                        INSERT INTO usuarios (username, password_hash, salt, role, nome_completo)
-                        VALUES (?, ?, ?, 'admin', 'Administrador')
-                    """, (novo_user, hash_senha, salt))
-                    conn.commit()
-                    conn.close()
-                    st.success("Administrador criado!")
-                except:
-                    st.error("Usuário já existe.")
-
-    with tabs[3]:  # Minha Conta
+            try:
+                get_servicos().criar_admin(novo_user, nova_senha)
+                st.success("Administrador criado!")
+            except ValueError as e:
+                st.error(str(e))
+
+    with tabs[4]:  # Minha Conta
+        diagnostico.secao("Minha Conta")
         st.subheader("Alterar minha senha")
         senha_atual = st.text_input("Senha atual", type="password")
         nova_senha = st.text_input("Nova senha", type="password")
@@ -410,49 +581,24 @@ elif menu == "📊 Painel Administrativo":
                 st.error("As novas senhas não coincidem")
             elif nova_senha == senha_atual:
                 st.error("A nova senha deve ser diferente da atual")
+            elif get_servicos().alterar_senha(st.session_state.user, senha_atual, nova_senha):
+                st.success("Senha alterada com sucesso!")
             else:
-                conn = get_conn()
-                row = conn.execute("""
-                    SELECT password_hash, salt FROM usuarios
-                    WHERE username = ? AND role = 'admin'
-                """, (st.session_state.user,)).fetchone()
-
-                if row and verify_password(senha_atual, row[0], row[1]):
-                    novo_salt = generate_salt()
-                    novo_hash = hash_password(nova_senha, novo_salt)
-                    conn.execute("""
-                        UPDATE usuarios
-                        SET password_hash = ?, salt = ?
-                        WHERE username = ?
-                    """, (novo_hash, novo_salt, st.session_state.user))
-                    conn.commit()
-                    conn.close()
-                    st.success("Senha alterada com sucesso!")
-                else:
-                    st.error("Senha atual incorreta")
-                    conn.close()
+                st.error("Senha atual incorreta")
 
-    with tabs[4]:  # Usuários Cadastrados
+    with tabs[5]:  # Usuários Cadastrados
+        diagnostico.secao("Usuários Cadastrados")
         st.subheader("Usuários Cadastrados (Moradores)")
 
-        conn = get_conn()
-        df_usuarios = pd.read_sql_query("""
-            SELECT username, nome_completo, apartamento, email, telefone, data_cadastro, ativo
-            FROM usuarios
-            WHERE role = 'morador'
-            ORDER BY data_cadastro DESC
-        """, conn)
-        conn.close()
+        df_usuarios = get_servicos().listar_moradores()
 
         if df_usuarios.empty:
             st.info("Ainda não há moradores cadastrados.")
         else:
             filtro = st.text_input("Filtrar por nome ou apartamento", "")
             if filtro:
-                df_filtrado = df_usuarios[
-                    df_usuarios['nome_completo'].str.contains(filtro, case=False, na=False) |
-                    df_usuarios['apartamento'].str.contains(filtro, case=False, na=False)
-                ]
+                with get_banco().conexao() as conn:
+                    df_filtrado, _ = buscar_moradores(conn, filtro, tamanho=len(df_usuarios))
             else:
                 df_filtrado = df_usuarios
 
@@ -481,20 +627,14 @@ elif menu == "📊 Painel Administrativo":
 
                 if st.button("Aplicar Bloqueio"):
                     novo_ativo = 0 if acao_bloqueio == "Bloquear" else 1
-                    conn = get_conn()
-                    conn.execute("UPDATE usuarios SET ativo = ? WHERE username = ?", (novo_ativo, usuario_sel))
-                    conn.commit()
-                    conn.close()
+                    get_servicos().definir_ativo(usuario_sel, novo_ativo)
                     st.success(f"Usuário {usuario_sel} {'bloqueado' if novo_ativo == 0 else 'desbloqueado'} com sucesso!")
                     st.rerun()
 
             with col2:
                 if st.button("Excluir Usuário", type="primary"):
                     if st.session_state.get(f"confirm_delete_user_{usuario_sel}", False):
-                        conn = get_conn()
-                        conn.execute("DELETE FROM usuarios WHERE username = ?", (usuario_sel,))
-                        conn.commit()
-                        conn.close()
+                        get_servicos().excluir_usuario(usuario_sel)
                         st.success(f"Usuário {usuario_sel} excluído permanentemente.")
                         if f"confirm_delete_user_{usuario_sel}" in st.session_state:
                             del st.session_state[f"confirm_delete_user_{usuario_sel}"]
@@ -506,27 +646,122 @@ elif menu == "📊 Painel Administrativo":
             with col3:
                 st.caption("Atenção: exclusão é irreversível")
 
-    with tabs[5]:
+    with tabs[6]:
+        diagnostico.secao("Configurações")
         st.subheader("Configurações")
-        conn = get_conn()
-        row = conn.execute("SELECT valor FROM config WHERE chave = 'whatsapp_urgente_link'").fetchone()
-        link_atual = row[0] if row else ""
-
-        novo_link = st.text_input("Link do grupo WhatsApp", value=link_atual, placeholder="https://chat.whatsapp.com/...")
+        config = get_config()
+        novo_link = st.text_input("Link do grupo WhatsApp", value=config.obter(CHAVE_WHATSAPP, ""),
+                                  placeholder="https://chat.whatsapp.com/...")
+        novas_categorias = st.text_area("Áreas (uma por linha)", value="\n".join(config.categorias()))
+        # Usado pela manutenção (python -m condominio.manutencao arquivar)
+        dias_arquivar = st.number_input("Arquivar chamados concluídos há mais de (dias)", min_value=30, step=30,
+                                        value=int(config.obter(CHAVE_DIAS_ARQUIVAR, DIAS_ARQUIVAR)))
         if st.button("Salvar"):
-            conn.execute("INSERT OR REPLACE INTO config (chave, valor) VALUES ('whatsapp_urgente_link', ?)", (novo_link.strip(),))
-            conn.commit()
-            conn.close()
-            st.success("Link salvo!")
-            st.rerun()
+            categorias = [c.strip() for c in novas_categorias.splitlines() if c.strip()]
+            if not categorias:
+                st.error("Informe ao menos uma área")
+            else:
+                config.salvar({CHAVE_WHATSAPP: novo_link.strip(), CHAVE_CATEGORIAS: "\n".join(categorias),
+                               CHAVE_DIAS_ARQUIVAR: str(dias_arquivar)})
+                st.success("Configurações salvas!")
+                st.rerun()
+
+    with tabs[7]:  # Exportar
+        diagnostico.secao("Exportar")
+        st.subheader("Exportar dados")
+        ecol1, ecol2 = st.columns(2)
+        with ecol1:
+            tabela_exportacao = st.radio("Dados", ["Ocorrências", "Moradores"], horizontal=True, key="exp_tabela")
+            formato_exportacao = st.radio("Formato", list(FORMATOS), horizontal=True, key="exp_formato")
+        with ecol2:
+            status_exportacao = st.multiselect("Status", OPCOES_STATUS, key="exp_status")
+            periodo_exportacao = st.date_input("Período de abertura", value=(), format="DD/MM/YYYY", key="exp_periodo")
+            incluir_foto = st.checkbox("Incluir referência das fotos", key="exp_foto")
+
+        if st.button("Gerar arquivo", key="exp_gerar"):
+            escrever, mime = FORMATOS[formato_exportacao]
+            # Linhas vão do cursor direto para um arquivo temporário, em lotes
+            with tempfile.TemporaryFile() as arquivo:
+                with get_banco().conexao() as conn:
+                    if tabela_exportacao == "Ocorrências":
+                        desde, ate = intervalo_iso(periodo_exportacao)
+                        cabecalho, linhas = exportar_ocorrencias(conn, status_exportacao, desde, ate, incluir_foto)
+                    else:
+                        cabecalho, linhas = exportar_moradores(conn)
+                    escrever(cabecalho, linhas, arquivo)
+                arquivo.seek(0)
+                conteudo_exportacao = arquivo.read()
+            nome_arquivo = f"{tabela_exportacao.lower()}_{datetime.now():%Y%m%d_%H%M}.{formato_exportacao}"
+            st.download_button(f"Baixar {nome_arquivo}", conteudo_exportacao, file_name=nome_arquivo, mime=mime)
+
+    with tabs[8]:  # Diagnóstico
+        diagnostico.secao("Diagnóstico")
+        st.subheader("Diagnóstico de desempenho")
+        dcol1, dcol2 = st.columns([1, 3])
+        with dcol1:
+            novo_limite = st.number_input("Consulta lenta a partir de (ms)", min_value=1,
+                                          value=int(diagnostico.limite_ms), step=50, key="diag_limite")
+            if st.button("Salvar limite", key="diag_salvar"):
+                get_config().salvar({CHAVE_LIMITE_LENTA: str(novo_limite)})
+                st.success("Limite salvo!")
+        with dcol2:
+            st.caption(f"Consultas acima do limite são gravadas em `{CONSULTAS_LENTAS_PATH}`. "
+                       + ("Os números abaixo são deste condomínio, neste processo, desde que ele foi aberto."
+                          if CONDOMINIOS_PASTA else "Os números abaixo são deste processo, desde que ele iniciou."))
+
+        reruns = diagnostico.reruns_recentes()[::-1]
+        st.markdown("**Últimos reruns**")
+        if not reruns:
+            st.info("Nenhum rerun registrado ainda.")
+        else:
+            st.dataframe(pd.DataFrame([{
+                "Quando": datetime.fromtimestamp(r["quando"]).strftime(FORMATO_EXIBICAO),
+                "Página": r["pagina"],
+                "Total (ms)": round(r["total_ms"], 1),
+                "SQL (ms)": round(r["sql_ms"], 1),
+                "Consultas": r["consultas"],
+                "Linhas": r["linhas"],
+                "Seções": ", ".join(f"{nome} {ms:.0f} ms" for nome, ms in
+                                    sorted(r["secoes"].items(), key=lambda item: -item[1])),
+                "Interrompido": r["interrompido"],
+            } for r in reruns]), use_container_width=True, hide_index=True)
+
+        st.markdown("**Consultas que mais somaram tempo**")
+        for grupo in diagnostico.piores():
+            titulo = (f"{grupo['total_ms']:.1f} ms em {grupo['execucoes']}x "
+                      f"(máx. {grupo['max_ms']:.1f} ms, {grupo['linhas']} linhas) · {grupo['sql'][:80]}")
+            with st.expander(titulo):
+                st.code(grupo["sql"], language="sql")
+                # O EXPLAIN só roda para quem pediu: a aba é redesenhada a cada rerun do admin
+                if not st.toggle("Mostrar plano", key=f"diag_plano_{grupo['sql']}"):
+                    continue
+                try:
+                    with get_banco().conexao() as conn:
+                        plano = plano_consulta(conn, grupo["sql"])
+                except sqlite3.Error as e:
+                    plano = [f"(plano indisponível: {e})"]
+                if plano:
+                    st.code("\n".join(plano), language="text")
+                else:
+                    st.caption("Sem plano: escrita ou trecho fora do SQL.")
+
+        st.markdown("**Consultas recentes**")
+        consultas = diagnostico.consultas_recentes()[::-1][:200]
+        if consultas:
+            st.dataframe(pd.DataFrame([{
+                "Quando": datetime.fromtimestamp(c["quando"]).strftime(FORMATO_EXIBICAO),
+                "Página": c["pagina"],
+                "Seção": c["secao"],
+                "ms": round(c["ms"], 2),
+                "Linhas": c["linhas"],
+                "SQL": c["sql"],
+            } for c in consultas]), use_container_width=True, hide_index=True)
 
 # ====================== MEUS CHAMADOS ======================
 elif menu == "👋 Meus Chamados":
     st.header(f"Registros de {st.session_state.nome}")
 
-    conn = get_conn()
-    df = pd.read_sql_query("SELECT * FROM ocorrencias WHERE criado_por = ? ORDER BY data_envio DESC", conn, params=(st.session_state.user,))
-    conn.close()
+    df = get_servicos().do_morador(st.session_state.user)
 
     if df.empty:
         st.info("Nenhum registro encontrado.")
@@ -536,10 +771,11 @@ elif menu == "👋 Meus Chamados":
                 st.write("**Status:**", reg["status"])
                 st.write("**Local:**", reg["local_detalhado"])
                 st.write("**Descrição:**", reg["descricao"])
-                if reg["foto_base64"]:
-                    st.image(base64.b64decode(reg["foto_base64"]))
+                if reg["tem_foto"]:
+                    exibir_foto(reg["id"], f"meus_{reg['id']}")
                 if reg["data_conclusao"]:
                     st.write("**Resolvido em:**", calcular_tempo_finalizacao(reg["data_envio"], reg["data_conclusao"]))
 
 
 st.sidebar.caption("Condomínio Pro • 2026")
+diagnostico.finalizar_rerun()
@@ -0,0 +1,126 @@
+"""Benchmark das consultas das páginas: SELECT * com fotos inline x projeções.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_consultas --ocorrencias 50000 --foto-kb 32
+
+Semeia dois bancos temporários com os mesmos dados: um no formato antigo
+(foto em ``foto_base64``) consultado com ``SELECT *`` como as páginas faziam,
+e outro criado pelo ``condominio.esquema`` (mesmo esquema do app, com ``foto_hash``)
+e consultado pelo ``condominio.consultas``. Cada cenário roda em um processo
+separado para que o pico de RSS seja só dele.
+"""
+import argparse
+import base64
+import hashlib
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.comum import em_processo, pico_rss_mb
+
+CATEGORIAS = ["Corredor", "Garagem", "Jardim", "Academia", "Elevador", "Piscina", "Outros"]
+STATUS = ["Pendente", "Em Manutenção", "Concluído", "Concluído"]
+MORADORES = 500
+
+
+# ====================== SEMENTE ======================
+def _linhas(n, foto_kb, legado):
+    rnd = random.Random(42)
+    # Formato antigo: datas "dd/mm/aaaa hh:mm"; atual: ISO 8601
+    fmt = "%d/%m/%Y %H:%M" if legado else "%Y-%m-%d %H:%M:%S"
+    inicio = datetime(2022, 1, 1)
+    for i in range(n):
+        foto = rnd.randbytes(foto_kb * 1024)
+        envio = inicio + timedelta(minutes=rnd.randrange(4 * 365 * 24 * 60))
+        status = rnd.choice(STATUS)
+        conclusao = envio + timedelta(minutes=rnd.randrange(30, 20000)) if status == "Concluído" else None
+        yield (
+            f"{i:08X}", "Abertura de Chamado", rnd.choice(CATEGORIAS), f"Bloco {i % 20}",
+            f"Descrição do chamado {i}", status, envio.strftime(fmt),
+            conclusao.strftime(fmt) if conclusao else None,
+            f"morador{i % MORADORES}",
+            base64.b64encode(foto).decode() if legado else hashlib.sha256(foto).hexdigest(),
+        )
+
+def semear(caminho_db, n, foto_kb, legado):
+    conn = sqlite3.connect(caminho_db, isolation_level=None)
+    if legado:
+        # Tabela como a dos snapshots antigos: chave TEXT, foto inline e nenhum índice
+        conn.execute("""CREATE TABLE ocorrencias (
+            id TEXT PRIMARY KEY, tipo_registro TEXT, categoria TEXT NOT NULL,
+            local_detalhado TEXT, descricao TEXT NOT NULL, foto_base64 TEXT,
+            status TEXT DEFAULT 'Pendente', data_envio TEXT, data_conclusao TEXT,
+            criado_por TEXT DEFAULT 'Anônimo'
+        )""")
+    else:
+        from condominio.esquema import atualizar_esquema
+        atualizar_esquema(conn)
+    coluna_foto = "foto_base64" if legado else "foto_hash"
+    conn.execute("BEGIN")
+    conn.executemany(f"""
+        INSERT INTO ocorrencias
+        (id, tipo_registro, categoria, local_detalhado, descricao, status,
+         data_envio, data_conclusao, criado_por, {coluna_foto})
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, _linhas(n, foto_kb, legado))
+    conn.commit()
+    conn.close()
+
+
+# ====================== CENÁRIOS ======================
+def _consultas_antigas(conn):
+    import pandas as pd
+    return [
+        pd.read_sql_query("SELECT * FROM ocorrencias WHERE status != 'Concluído' ORDER BY data_envio DESC", conn),
+        pd.read_sql_query("SELECT * FROM ocorrencias WHERE status = 'Concluído'", conn),
+        pd.read_sql_query("SELECT * FROM ocorrencias WHERE criado_por = ? ORDER BY data_envio DESC", conn, params=("morador7",)),
+    ]
+
+def _consultas_atuais(conn):
+    from condominio.consultas import pagina_pendentes, contar_pendentes, listar_do_morador
+    from condominio.relatorios import tempos_resolucao
+    return [pagina_pendentes(conn, {})[0], contar_pendentes(conn, {}), tempos_resolucao(conn),
+            listar_do_morador(conn, "morador7")]
+
+def _medir(caminho_db, cenario, repeticoes, saida):
+    import pandas  # noqa: F401  (importado antes para não contar no pico do cenário)
+    consultas = _consultas_antigas if cenario == "antes" else _consultas_atuais
+    base = pico_rss_mb()
+    conn = sqlite3.connect(caminho_db)
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        dfs = consultas(conn)
+        tempos.append(time.perf_counter() - t0)
+        del dfs
+    conn.close()
+    saida.put((min(tempos), sorted(tempos)[len(tempos) // 2], pico_rss_mb() - base))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ocorrencias", type=int, default=50_000)
+    parser.add_argument("--foto-kb", type=int, default=32)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Tudo que o código grava por caminho relativo (evidencias/, bancos.txt) fica no temporário
+        os.chdir(tmp)
+        bancos = {"antes": os.path.join(tmp, "antes.db"), "depois": os.path.join(tmp, "depois.db")}
+        for cenario, caminho in bancos.items():
+            t0 = time.perf_counter()
+            semear(caminho, args.ocorrencias, args.foto_kb, legado=(cenario == "antes"))
+            tamanho = os.path.getsize(caminho) / (1024 * 1024)
+            print(f"[{cenario}] semeado em {time.perf_counter() - t0:.1f}s ({tamanho:.1f} MB)")
+
+        print(f"\n{'cenário':<8} {'mín (s)':>9} {'mediana (s)':>12} {'pico RSS (MB)':>14}")
+        for cenario, caminho in bancos.items():
+            minimo, mediana, rss = em_processo(_medir, caminho, cenario, args.repeticoes)
+            print(f"{cenario:<8} {minimo:>9.3f} {mediana:>12.3f} {rss:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""Benchmark dos caminhos de dados das páginas sobre um condomínio sintético.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_paginas --moradores 2000 --ocorrencias 50000 --sessoes 8
+
+Semeia um banco temporário pelo ``condominio.esquema`` (mesmo esquema do app)
+com N moradores e M ocorrências, parte delas com foto, e mede cada caminho
+usado pelas páginas: login, registro, consulta de protocolo, fila de
+pendentes (carga completa e atualização ao vivo sem mudanças), relatório
+de concluídos e busca de moradores. Cada caminho roda num processo
+separado, para que o pico de RSS seja só dele.
+
+O cenário de concorrência abre ``--sessoes`` processos, cada um simulando uma
+sessão com o ``AppTest`` do Streamlit que registra chamados no mesmo banco ao
+mesmo tempo. Mede o tempo de cada rerun com clique em "Registrar".
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.comum import em_processo, pico_rss_mb
+
+CATEGORIAS = ["Corredor", "Garagem", "Jardim", "Academia", "Elevador", "Piscina", "Outros"]
+STATUS = ["Pendente", "Em Manutenção", "Concluído", "Concluído", "Concluído"]
+PALAVRAS = ["vazamento", "lâmpada", "queimada", "portão", "barulho", "infiltração", "elevador",
+            "parado", "lixo", "acumulado", "goteira", "interfone", "quebrado", "vaga", "ocupada"]
+SENHA = "senha-de-teste"
+
+
+# ====================== SEMENTE ======================
+def semear(caminho_db, moradores, n_ocorrencias, fracao_foto):
+    from condominio.autenticacao import criar_hash
+    from condominio.banco import Banco
+    from condominio.esquema import atualizar_esquema
+    from condominio.protocolos import gerar_protocolo
+
+    rnd = random.Random(42)
+    banco = Banco(caminho_db)
+    with banco.conexao() as conn:
+        atualizar_esquema(conn)
+
+    # Um único hash para todos: o custo do PBKDF2 é medido no login, não na semente
+    hash_senha, salt = criar_hash(SENHA)
+    with banco.transacao() as conn:
+        conn.executemany("""
+            INSERT INTO usuarios (username, password_hash, salt, role, nome_completo, apartamento, email)
+            VALUES (?, ?, ?, 'morador', ?, ?, ?)
+        """, [(f"morador{i}", hash_senha, salt, f"Morador {rnd.choice(PALAVRAS).title()} {i}",
+               f"{i // 4 + 101}", f"morador{i}@exemplo.com") for i in range(moradores)])
+
+    inicio = datetime(2022, 1, 1)
+    protocolos = []
+    with banco.transacao() as conn:
+        for i in range(n_ocorrencias):
+            envio = inicio + timedelta(minutes=rnd.randrange(4 * 365 * 24 * 60))
+            status = rnd.choice(STATUS)
+            conclusao = envio + timedelta(minutes=rnd.randrange(30, 20000)) if status == "Concluído" else None
+            protocolo = gerar_protocolo(conn)
+            conn.execute("""
+                INSERT INTO ocorrencias
+                (id, tipo_registro, categoria, local_detalhado, descricao, status,
+                 data_envio, data_conclusao, criado_por, foto_hash)
+                VALUES (?, 'Abertura de Chamado', ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (protocolo, rnd.choice(CATEGORIAS), f"Bloco {i % 20}",
+                  " ".join(rnd.choices(PALAVRAS, k=8)), status,
+                  envio.strftime("%Y-%m-%d %H:%M:%S"),
+                  conclusao.strftime("%Y-%m-%d %H:%M:%S") if conclusao else None,
+                  f"morador{rnd.randrange(max(moradores, 1))}",
+                  f"{rnd.getrandbits(256):064x}" if rnd.random() < fracao_foto else None))
+            protocolos.append(protocolo)
+    banco.fechar()
+    return protocolos
+
+
+# ====================== CAMINHOS ======================
+def _caminhos(banco, protocolos, rnd):
+    """Cada caminho é uma função sem argumentos que faz o que uma página faz."""
+    from condominio.autenticacao import autenticar
+    from condominio.busca import buscar_moradores
+    from condominio.consultas import buscar_protocolo, contar_pendentes, pagina_pendentes
+    from condominio.fila import FilaAoVivo
+    from condominio.ocorrencias import abrir_ocorrencia
+    from condominio.relatorios import idade_fila, resumo_por, tempos_resolucao
+
+    def login():
+        autenticar(banco, f"morador{rnd.randrange(100)}", SENHA)
+
+    def registro():
+        with banco.transacao() as conn:
+            abrir_ocorrencia(conn, "Abertura de Chamado", "Garagem", "Vaga 12", "Benchmark de registro", None, "bench")
+
+    def protocolo():
+        with banco.conexao() as conn:
+            buscar_protocolo(conn, rnd.choice(protocolos))
+
+    def fila():
+        with banco.conexao() as conn:
+            contar_pendentes(conn, {})
+            pagina_pendentes(conn, {})
+
+    fila_viva = FilaAoVivo({})
+
+    def fila_ao_vivo():
+        # Consulta periódica da aba Atendimentos: só a primeira lê a página, as outras conferem a versão
+        with banco.conexao() as conn:
+            fila_viva.atualizar(conn)
+
+    def relatorio():
+        with banco.conexao() as conn:
+            df = tempos_resolucao(conn)
+            idade_fila(conn)
+        resumo_por(df, "categoria")
+        resumo_por(df, "mes")
+
+    def moradores():
+        with banco.conexao() as conn:
+            buscar_moradores(conn, rnd.choice(PALAVRAS[:5]))
+
+    return {"login": login, "registro": registro, "protocolo": protocolo,
+            "fila": fila, "fila_ao_vivo": fila_ao_vivo, "relatorio": relatorio, "moradores": moradores}
+
+def _medir(caminho_db, protocolos, nome, repeticoes, saida):
+    import pandas  # noqa: F401  (importado antes para não contar no pico do caminho)
+    from condominio.banco import Banco
+
+    banco = Banco(caminho_db)
+    caminho = _caminhos(banco, protocolos, random.Random(7))[nome]
+    # Base depois dos imports e antes do aquecimento: ru_maxrss só cresce, e o primeiro uso
+    # (pool de conexões, cache de páginas do SQLite, DataFrames) é justamente o pico do caminho
+    base = pico_rss_mb()
+    caminho()  # aquecimento: os tempos medem o caminho já com o pool e o cache prontos
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        caminho()
+        tempos.append(time.perf_counter() - t0)
+    banco.fechar()
+    saida.put((tempos, pico_rss_mb() - base))
+
+
+# ====================== CONCORRÊNCIA ======================
+def _sessao(pasta, registros, saida):
+    from streamlit.testing.v1 import AppTest
+
+    # O app usa caminhos relativos (condominio.db, evidencias/)
+    os.chdir(pasta)
+    at = AppTest.from_file(os.path.join(RAIZ, "app.py"), default_timeout=120).run()
+    tempos, erros = [], 0
+    for i in range(registros):
+        at.text_area[0].set_value(f"Registro concorrente {os.getpid()} {i}")
+        t0 = time.perf_counter()
+        at.button[0].click().run()
+        tempos.append(time.perf_counter() - t0)
+        # Exceção, "database is locked" ou qualquer rerun sem o protocolo conta como erro
+        erros += bool(at.exception) or not any("Protocolo" in s.value for s in at.success)
+    saida.put((tempos, erros))
+
+def concorrencia(caminho_db, sessoes, registros):
+    with tempfile.TemporaryDirectory() as pasta:
+        shutil.copy(caminho_db, os.path.join(pasta, "condominio.db"))
+        ctx = multiprocessing.get_context("spawn")
+        saida = ctx.Queue()
+        procs = [ctx.Process(target=_sessao, args=(pasta, registros, saida)) for _ in range(sessoes)]
+        for proc in procs:
+            proc.start()
+        resultados = [saida.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+    tempos = [t for parcial, _ in resultados for t in parcial]
+    return tempos, sum(erros for _, erros in resultados)
+
+
+# ====================== RELATÓRIO ======================
+def percentis(tempos):
+    ordenados = sorted(tempos)
+    def p(q):
+        return ordenados[min(len(ordenados) - 1, int(q * len(ordenados)))]
+    return statistics.median(ordenados), p(0.95), p(0.99)
+
+def _linha(nome, tempos, extra):
+    p50, p95, p99 = percentis(tempos)
+    print(f"{nome:<12} {len(tempos):>6} {p50 * 1000:>9.2f} {p95 * 1000:>9.2f} {p99 * 1000:>9.2f} {extra:>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--moradores", type=int, default=2_000)
+    parser.add_argument("--ocorrencias", type=int, default=50_000)
+    parser.add_argument("--fracao-foto", type=float, default=0.3)
+    parser.add_argument("--repeticoes", type=int, default=50)
+    parser.add_argument("--repeticoes-login", type=int, default=5, help="cada login custa um PBKDF2 completo")
+    parser.add_argument("--sessoes", type=int, default=4, help="0 desliga o cenário com AppTest")
+    parser.add_argument("--registros", type=int, default=10, help="registros por sessão concorrente")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Tudo que o código grava por caminho relativo (evidencias/, bancos.txt) fica no temporário
+        os.chdir(tmp)
+        caminho_db = os.path.join(tmp, "condominio.db")
+        t0 = time.perf_counter()
+        protocolos = semear(caminho_db, args.moradores, args.ocorrencias, args.fracao_foto)
+        tamanho = os.path.getsize(caminho_db) / (1024 * 1024)
+        print(f"semeado em {time.perf_counter() - t0:.1f}s ({tamanho:.1f} MB)")
+        amostra = random.Random(3).sample(protocolos, min(len(protocolos), 1_000))
+
+        print(f"\n{'caminho':<12} {'n':>6} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'pico RSS (MB)':>14}")
+        for nome in ("login", "registro", "protocolo", "fila", "fila_ao_vivo", "relatorio", "moradores"):
+            repeticoes = args.repeticoes_login if nome == "login" else args.repeticoes
+            tempos, rss = em_processo(_medir, caminho_db, amostra, nome, repeticoes)
+            _linha(nome, tempos, f"{rss:.1f}")
+
+        if args.sessoes:
+            tempos, erros = concorrencia(caminho_db, args.sessoes, args.registros)
+            _linha(f"{args.sessoes} sessões", tempos, f"{erros} erro(s)")
+
+
+if __name__ == "__main__":
+    main()
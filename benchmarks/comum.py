@@ -0,0 +1,23 @@
+"""Medição comum aos benchmarks: pico de RSS e execução em processo separado."""
+import multiprocessing
+import resource
+import sys
+
+
+def pico_rss_mb():
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+def em_processo(alvo, *args):
+    """Roda ``alvo(*args, saida)`` num processo novo e devolve o que ele pôs em ``saida``.
+
+    Com spawn o processo parte só com os imports do benchmark, e o pico de RSS
+    medido nele é só do cenário.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    saida = ctx.Queue()
+    proc = ctx.Process(target=alvo, args=(*args, saida))
+    proc.start()
+    resultado = saida.get()
+    proc.join()
+    return resultado
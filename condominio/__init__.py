@@ -0,0 +1 @@
+"""Serviços do Condomínio Pro (banco, fotos e regras de negócio)."""
@@ -0,0 +1,329 @@
+"""API HTTP (JSON) sobre os mesmos ``Servicos`` da página, sem Streamlit.
+
+Uso:
+    python -m condominio.api --db condominio.db --porta 8000
+    python -m condominio.api --pasta condominios/ --porta 8000    (multicondomínio)
+
+Rotas:
+    POST   /sessoes                    login; devolve um token para o cabeçalho "Authorization: Bearer"
+    GET    /categorias                 áreas aceitas na abertura
+    POST   /ocorrencias                abre um chamado (anônimo ou com token); foto em base64
+    GET    /ocorrencias/{protocolo}    consulta pública, com histórico (também as arquivadas)
+    GET    /ocorrencias                fila em aberto (admin), paginada por ``cursor``
+    PATCH  /ocorrencias/{protocolo}    muda o status (admin)
+    POST   /ocorrencias/status         muda o status de vários protocolos (admin)
+    DELETE /ocorrencias/{protocolo}    exclui (admin)
+    GET    /meus-chamados              chamados do usuário do token
+
+No modo multicondomínio as mesmas rotas ficam sob ``/{condominio}`` (ex.:
+``POST /jardim-das-flores/ocorrencias``) e o token vale só no condomínio em
+que o login foi feito: o admin de um prédio não age nos outros.
+
+O token é assinado (HMAC) com ``CONDOMINIO_API_SEGREDO``; sem a variável, um
+segredo aleatório vale só enquanto o processo viver. Cada requisição com token
+confere se o usuário continua ativo. Por padrão a API só grava notificações na
+caixa de saída e o despachante do processo do Streamlit as envia; com
+``--despachar`` a própria API envia.
+"""
+import argparse
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import time
+from datetime import datetime
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+from condominio.condominios import CondominioDesconhecido
+from condominio.consultas import STATUS_ABERTOS
+from condominio.fotos import TAMANHO_MAX_UPLOAD
+from condominio.protocolos import formatar
+
+log = logging.getLogger(__name__)
+
+VALIDADE_TOKEN_S = 8 * 60 * 60
+VARIAVEL_SEGREDO = "CONDOMINIO_API_SEGREDO"
+# Foto em base64 (4 caracteres a cada 3 bytes) no limite de upload, mais folga para os outros campos
+TAMANHO_MAX_FOTO_B64 = -(-TAMANHO_MAX_UPLOAD // 3) * 4
+TAMANHO_MAX_CORPO = TAMANHO_MAX_FOTO_B64 + 64 * 1024
+
+
+# ====================== TOKENS ======================
+def _b64(dados: bytes) -> str:
+    return base64.urlsafe_b64encode(dados).rstrip(b"=").decode()
+
+def emitir_token(segredo: bytes, usuario: str, condominio: str = None, validade_s: int = VALIDADE_TOKEN_S) -> str:
+    carga = _b64(json.dumps({"u": usuario, "c": condominio, "exp": int(time.time()) + validade_s}).encode())
+    return f"{carga}.{_b64(hmac.new(segredo, carga.encode(), hashlib.sha256).digest())}"
+
+def ler_token(segredo: bytes, token: str, condominio: str = None):
+    """Usuário do token, ou None se a assinatura não confere, ele expirou ou é de outro condomínio."""
+    carga, _, assinatura = token.partition(".")
+    esperada = _b64(hmac.new(segredo, carga.encode(), hashlib.sha256).digest())
+    # Em bytes: o cabeçalho pode trazer caracteres fora do ASCII, que compare_digest recusa em str
+    if not hmac.compare_digest(assinatura.encode(), esperada.encode()):
+        return None
+    try:
+        dados = json.loads(base64.urlsafe_b64decode(carga + "=" * (-len(carga) % 4)))
+    except (binascii.Error, ValueError):
+        return None
+    if dados.get("c") != condominio or dados.get("exp", 0) <= time.time():
+        return None
+    return dados["u"]
+
+
+# ====================== CONVERSÕES ======================
+def _registros(df) -> list:
+    # to_json converte os tipos do numpy e NaN/None para JSON
+    return json.loads(df.to_json(orient="records", force_ascii=False))
+
+def _cursor(texto):
+    # Cursor da fila (data_envio, id) como "data_envio|id" na query string
+    if not texto:
+        return None
+    data_envio, _, protocolo = texto.rpartition("|")
+    return data_envio, protocolo
+
+async def _corpo(request) -> dict:
+    # Lido aos pedaços para recusar um corpo grande demais antes de guardá-lo inteiro na memória
+    partes, tamanho = [], 0
+    async for parte in request.stream():
+        tamanho += len(parte)
+        if tamanho > TAMANHO_MAX_CORPO:
+            raise HTTPException(413, "Corpo grande demais")
+        partes.append(parte)
+    try:
+        corpo = json.loads(b"".join(partes))
+    except ValueError:
+        raise HTTPException(400, "Corpo JSON inválido") from None
+    if not isinstance(corpo, dict):
+        raise HTTPException(400, "Corpo JSON inválido")
+    return corpo
+
+def _texto(corpo: dict, chave: str, padrao=None):
+    """Campo de texto do corpo; null vale como ausente e outro tipo (lista, número...) é ``ValueError``."""
+    valor = corpo.get(chave)
+    if valor is None:
+        return padrao
+    if not isinstance(valor, str):
+        raise ValueError(f"O campo {chave} deve ser texto")
+    return valor
+
+def _data_filtro(params, chave: str):
+    valor = params.get(chave)
+    if valor:
+        try:
+            datetime.fromisoformat(valor)
+        except ValueError:
+            raise ValueError(f"O filtro {chave} deve ser uma data ISO (aaaa-mm-dd)") from None
+    return valor
+
+def _foto(corpo: dict):
+    foto = _texto(corpo, "foto")
+    if not foto:
+        return None
+    # Conferido antes de decodificar: o limite de preparar_foto só viria depois da cópia em memória
+    if len(foto) > TAMANHO_MAX_FOTO_B64:
+        raise ValueError(f"A foto deve ter no máximo {TAMANHO_MAX_UPLOAD // (1024 * 1024)} MB.")
+    try:
+        return base64.b64decode(foto, validate=True)
+    except binascii.Error:
+        raise ValueError("Foto em base64 inválida") from None
+
+
+# ====================== APLICAÇÃO ======================
+def criar_app(servicos, segredo: bytes, condominios=None) -> Starlette:
+    """Com ``condominios`` (modo multicondomínio) as rotas ficam sob ``/{condominio}`` e ``servicos`` é ignorado."""
+
+    async def servicos_de(request):
+        if condominios is None:
+            return servicos
+        return await run_in_threadpool(condominios.servicos, request.path_params["condominio"])
+
+    async def usuario(request, srv, papel=None):
+        """(usuário, papel) do token; sem token devolve (None, None), a não ser que ``papel`` seja exigido."""
+        cabecalho = request.headers.get("authorization", "")
+        if not cabecalho.startswith("Bearer "):
+            if papel:
+                raise HTTPException(401, "Token ausente")
+            return None, None
+        nome = ler_token(segredo, cabecalho[len("Bearer "):], request.path_params.get("condominio"))
+        papel_atual = await run_in_threadpool(srv.papel_ativo, nome) if nome else None
+        if papel_atual is None:
+            raise HTTPException(401, "Token inválido ou expirado")
+        if papel and papel_atual != papel:
+            raise HTTPException(403, "Acesso restrito")
+        return nome, papel_atual
+
+    async def sessoes(request):
+        srv = await servicos_de(request)
+        corpo = await _corpo(request)
+        ip = request.client.host if request.client else None
+        row, espera = await run_in_threadpool(srv.autenticar, _texto(corpo, "identificador", ""),
+                                              _texto(corpo, "senha", ""), ip)
+        if row:
+            token = emitir_token(segredo, row[0], request.path_params.get("condominio"))
+            return JSONResponse({"token": token, "usuario": row[0], "papel": row[3], "nome": row[4],
+                                 "validade_s": VALIDADE_TOKEN_S})
+        if espera:
+            return JSONResponse({"erro": "Muitas tentativas de login"}, 429, {"Retry-After": str(espera)})
+        return JSONResponse({"erro": "Credenciais inválidas ou usuário inativo."}, 401)
+
+    async def categorias(request):
+        srv = await servicos_de(request)
+        return JSONResponse(await run_in_threadpool(srv.categorias))
+
+    async def abrir(request):
+        srv = await servicos_de(request)
+        nome, _ = await usuario(request, srv)
+        corpo = await _corpo(request)
+        foto = _foto(corpo)
+        protocolo = await run_in_threadpool(
+            srv.abrir, _texto(corpo, "tipo_registro", "Abertura de Chamado"), _texto(corpo, "categoria"),
+            _texto(corpo, "local", ""), _texto(corpo, "descricao", ""), foto, nome)
+        return JSONResponse({"protocolo": protocolo, "protocolo_formatado": formatar(protocolo)}, 201)
+
+    async def consultar(request):
+        srv = await servicos_de(request)
+        registro = await run_in_threadpool(srv.consultar, request.path_params["protocolo"])
+        if registro is None:
+            raise HTTPException(404, "Protocolo não encontrado.")
+        registro["tem_foto"] = registro.pop("foto_hash") is not None
+        registro["historico"] = [{"status": status, "em": em} for status, em, _ in registro["historico"]]
+        return JSONResponse(registro)
+
+    async def fila(request):
+        srv = await servicos_de(request)
+        await usuario(request, srv, "admin")
+        params = request.query_params
+        status = params.getlist("status")
+        # A fila só tem chamados em aberto: um status fora deles seria ignorado em silêncio
+        if any(s not in STATUS_ABERTOS for s in status):
+            raise ValueError(f"Status da fila deve ser um de: {', '.join(STATUS_ABERTOS)}")
+        filtros = {
+            "status": status,
+            "categoria": params.getlist("categoria"),
+            "tipo_registro": params.getlist("tipo_registro"),
+            "desde": _data_filtro(params, "desde"),
+            "ate": _data_filtro(params, "ate"),
+        }
+        contagem, df, proximo = await run_in_threadpool(srv.fila, filtros, _cursor(params.get("cursor")))
+        return JSONResponse({"contagem": contagem, "ocorrencias": _registros(df),
+                             "proximo": "|".join(proximo) if proximo else None})
+
+    async def alterar(request):
+        srv = await servicos_de(request)
+        nome, _ = await usuario(request, srv, "admin")
+        corpo = await _corpo(request)
+        alterados, recusados = await run_in_threadpool(srv.alterar_status, [request.path_params["protocolo"]],
+                                                       _texto(corpo, "status"), nome, _texto(corpo, "quando"))
+        if recusados:
+            raise ValueError("A data da mudança é anterior à abertura do chamado")
+        # Como no DELETE: protocolo inexistente é 404; 0 só quando já estava no status pedido
+        if not alterados and await run_in_threadpool(srv.consultar, request.path_params["protocolo"]) is None:
+            raise HTTPException(404, "Protocolo não encontrado.")
+        return JSONResponse({"alterados": alterados})
+
+    async def alterar_varios(request):
+        srv = await servicos_de(request)
+        nome, _ = await usuario(request, srv, "admin")
+        corpo = await _corpo(request)
+        protocolos = corpo.get("protocolos")
+        if not isinstance(protocolos, list) or not protocolos:
+            raise ValueError("Informe a lista de protocolos")
+        if not all(isinstance(protocolo, str) for protocolo in protocolos):
+            raise ValueError("Os protocolos devem ser texto")
+        alterados, recusados = await run_in_threadpool(srv.alterar_status, protocolos, _texto(corpo, "status"),
+                                                       nome, _texto(corpo, "quando"))
+        # Recusados: abertos depois de "quando"; os demais foram alterados normalmente
+        return JSONResponse({"alterados": alterados, "recusados": recusados})
+
+    async def remover(request):
+        srv = await servicos_de(request)
+        nome, _ = await usuario(request, srv, "admin")
+        excluidos = await run_in_threadpool(srv.excluir, [request.path_params["protocolo"]], nome)
+        if not excluidos:
+            raise HTTPException(404, "Protocolo não encontrado.")
+        return JSONResponse({"excluidos": excluidos})
+
+    async def meus_chamados(request):
+        srv = await servicos_de(request)
+        nome, _ = await usuario(request, srv)
+        if nome is None:
+            raise HTTPException(401, "Token ausente")
+        return JSONResponse(_registros(await run_in_threadpool(srv.do_morador, nome)))
+
+    async def erro_validacao(request, erro):
+        return JSONResponse({"erro": str(erro)}, 400)
+
+    async def erro_desconhecido(request, erro):
+        return JSONResponse({"erro": str(erro)}, 404)
+
+    async def erro_http(request, erro):
+        return JSONResponse({"erro": erro.detail}, erro.status_code)
+
+    rotas = [
+        Route("/sessoes", sessoes, methods=["POST"]),
+        Route("/categorias", categorias, methods=["GET"]),
+        Route("/ocorrencias", abrir, methods=["POST"]),
+        Route("/ocorrencias", fila, methods=["GET"]),
+        Route("/ocorrencias/status", alterar_varios, methods=["POST"]),
+        Route("/ocorrencias/{protocolo}", consultar, methods=["GET"]),
+        Route("/ocorrencias/{protocolo}", alterar, methods=["PATCH"]),
+        Route("/ocorrencias/{protocolo}", remover, methods=["DELETE"]),
+        Route("/meus-chamados", meus_chamados, methods=["GET"]),
+    ]
+    if condominios is not None:
+        rotas = [Mount("/{condominio}", routes=rotas)]
+    return Starlette(routes=rotas, exception_handlers={
+        ValueError: erro_validacao, CondominioDesconhecido: erro_desconhecido, HTTPException: erro_http})
+
+
+def segredo_do_ambiente() -> bytes:
+    segredo = os.environ.get(VARIAVEL_SEGREDO)
+    if segredo:
+        return segredo.encode()
+    log.warning("%s não definido: os tokens valem só até o processo reiniciar", VARIAVEL_SEGREDO)
+    return secrets.token_bytes(32)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    from condominio.banco import Banco
+    from condominio.condominios import Condominios
+    from condominio.configuracoes import Configuracoes
+    from condominio.notificacoes import Despachante, envio_do_ambiente
+    from condominio.servicos import Servicos
+
+    parser = argparse.ArgumentParser(description="API HTTP do Condomínio Pro.")
+    parser.add_argument("--db", default="condominio.db")
+    parser.add_argument("--pasta", help="modo multicondomínio: pasta com catalogo.db e um banco por condomínio")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8000)
+    parser.add_argument("--despachar", metavar="ARQUIVO",
+                        help="envia as notificações por este processo: por SMTP (CONDOMINIO_SMTP_*) "
+                             "ou, sem ele, anexando-as a ARQUIVO (JSON lines)")
+    args = parser.parse_args()
+
+    if args.pasta:
+        # Um arquivo por condomínio na própria pasta, como faz a página
+        envio = (lambda c: envio_do_ambiente(os.path.join(args.pasta, f"{c}.{os.path.basename(args.despachar)}"))
+                 if args.despachar else None)
+        app = criar_app(None, segredo_do_ambiente(), Condominios(args.pasta, envio=envio))
+    else:
+        banco = Banco(args.db)
+        despachante = Despachante(banco, envio_do_ambiente(args.despachar)).iniciar() if args.despachar else None
+        servicos = Servicos(banco, Configuracoes(banco), despachante)
+        servicos.inicializar()
+        app = criar_app(servicos, segredo_do_ambiente())
+    uvicorn.run(app, host=args.host, port=args.porta)
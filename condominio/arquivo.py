@@ -0,0 +1,140 @@
+"""Arquivo de ocorrências concluídas antigas, fora do banco de trabalho.
+
+Cada banco tem ao lado o seu arquivo (``condominio.db`` → ``condominio.arquivo.db``)
+com uma linha por protocolo: a ocorrência inteira e o histórico dela em JSON
+comprimido (zlib). Só ``id``, ``data_conclusao`` e ``foto_hash`` ficam em
+colunas, para a consulta por protocolo e para a limpeza de fotos.
+
+No banco de trabalho a ocorrência sai de ``ocorrencias`` e o histórico dela
+é trocado por uma única transição "Arquivado", que mantém a versão
+(``versao_ocorrencias``) andando para a frente.
+
+O arquivo é gravado antes de apagar do banco de trabalho: uma interrupção no
+meio deixa o protocolo nos dois lugares, e a próxima execução termina o
+serviço. A consulta olha primeiro o banco de trabalho.
+"""
+import json
+import os
+import sqlite3
+import zlib
+from datetime import datetime, timedelta
+
+from condominio.datas import FORMATO_BANCO, agora
+from condominio.ocorrencias import LOTE_PARAMETROS, STATUS_CONCLUIDO, retirar_arquivadas
+
+CHAVE_DIAS_ARQUIVAR = "arquivar_concluidos_apos_dias"
+DIAS_ARQUIVAR = 365
+USUARIO_MANUTENCAO = "manutenção"
+
+
+def caminho_arquivo(caminho_db: str) -> str:
+    raiz, _ = os.path.splitext(caminho_db)
+    return f"{raiz}.arquivo.db"
+
+def abrir_arquivo(caminho_db: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(caminho_arquivo(caminho_db), isolation_level=None)
+    # Antes da primeira tabela: o arquivo já nasce pronto para o VACUUM incremental
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ocorrencias_arquivadas (
+            id TEXT PRIMARY KEY,
+            data_conclusao TEXT,
+            foto_hash TEXT,
+            arquivado_em TEXT NOT NULL,
+            dados BLOB NOT NULL
+        ) WITHOUT ROWID
+    """)
+    return conn
+
+
+# ====================== ARQUIVAMENTO ======================
+def _comprimir(registro: dict) -> bytes:
+    return zlib.compress(json.dumps(registro, ensure_ascii=False).encode(), 9)
+
+def arquivar(banco, dias: int = DIAS_ARQUIVAR) -> int:
+    """Move as ocorrências concluídas há mais de ``dias`` para o arquivo; devolve quantas."""
+    limite = (datetime.now() - timedelta(days=dias)).strftime(FORMATO_BANCO)
+    arquivo = None
+    total = 0
+    try:
+        while True:
+            # Em lotes: cada um segura o lock de escrita do banco de trabalho só por um instante
+            with banco.conexao() as conn:
+                cursor = conn.execute("""
+                    SELECT * FROM ocorrencias
+                    WHERE status = ? AND data_conclusao < ?
+                    LIMIT ?
+                """, (STATUS_CONCLUIDO, limite, LOTE_PARAMETROS))
+                colunas = [c[0] for c in cursor.description]
+                lote = [dict(zip(colunas, row)) for row in cursor.fetchall()]
+                protocolos = [registro["id"] for registro in lote]
+                historicos = {}
+                if protocolos:
+                    for protocolo, *transicao in conn.execute(f"""
+                        SELECT ocorrencia_id, status_anterior, status_novo, alterado_em, alterado_por
+                        FROM historico_status
+                        WHERE ocorrencia_id IN ({', '.join('?' * len(protocolos))})
+                        ORDER BY id
+                    """, protocolos):
+                        historicos.setdefault(protocolo, []).append(transicao)
+            if not lote:
+                return total
+
+            quando = agora()
+            # O arquivo só é criado quando há o que arquivar
+            arquivo = arquivo or abrir_arquivo(banco.caminho)
+            arquivo.execute("BEGIN IMMEDIATE")
+            arquivo.executemany("""
+                INSERT OR REPLACE INTO ocorrencias_arquivadas (id, data_conclusao, foto_hash, arquivado_em, dados)
+                VALUES (?, ?, ?, ?, ?)
+            """, [(r["id"], r["data_conclusao"], r["foto_hash"], quando,
+                   _comprimir({**r, "historico": historicos.get(r["id"], [])})) for r in lote])
+            arquivo.execute("COMMIT")
+
+            with banco.transacao() as conn:
+                apagados = retirar_arquivadas(conn, lote, quando, USUARIO_MANUTENCAO)
+            # Reabertos no meio-tempo continuam no banco de trabalho: a cópia arquivada sai
+            mantidos = set(protocolos) - set(apagados)
+            if mantidos:
+                arquivo.executemany("DELETE FROM ocorrencias_arquivadas WHERE id = ?",
+                                    [(protocolo,) for protocolo in mantidos])
+            total += len(apagados)
+            if len(lote) < LOTE_PARAMETROS:
+                return total
+    finally:
+        if arquivo:
+            arquivo.close()
+
+
+# ====================== CONSULTA ======================
+def buscar_arquivado(caminho_db: str, protocolo: str):
+    """A ocorrência arquivada com o histórico, no formato de ``Servicos.consultar``, ou None."""
+    caminho = caminho_arquivo(caminho_db)
+    if not os.path.exists(caminho):
+        return None
+    conn = sqlite3.connect(f"file:{caminho}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT dados FROM ocorrencias_arquivadas WHERE id = ?", (protocolo,)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    dados = json.loads(zlib.decompress(row[0]))
+    registro = {chave: dados.get(chave) for chave in ("id", "status", "descricao", "data_envio",
+                                                      "data_conclusao", "foto_hash")}
+    registro["historico"] = [(status_novo, alterado_em, alterado_por)
+                             for _, status_novo, alterado_em, alterado_por in dados["historico"]]
+    registro["arquivado"] = True
+    return registro
+
+def fotos_arquivadas(caminho_db: str) -> set:
+    caminho = caminho_arquivo(caminho_db)
+    if not os.path.exists(caminho):
+        return set()
+    conn = sqlite3.connect(f"file:{caminho}?mode=ro", uri=True)
+    try:
+        return {row[0] for row in conn.execute(
+            "SELECT DISTINCT foto_hash FROM ocorrencias_arquivadas WHERE foto_hash IS NOT NULL")}
+    finally:
+        conn.close()
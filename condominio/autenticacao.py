@@ -0,0 +1,143 @@
+"""Senhas (PBKDF2 versionado) e login com limite de tentativas por usuário e por IP.
+
+``usuarios.password_hash`` guarda ``pbkdf2_sha256$<iterações>$<hash>``; valores
+antigos, só com o hash em base64, foram gerados com 100 mil iterações. No login
+bem-sucedido a senha é regravada com os parâmetros atuais, então basta mudar
+``ITERACOES`` para que as contas migrem aos poucos.
+
+O PBKDF2 roda num pool pequeno de threads: o custo de CPU do hashing fica
+limitado a ``THREADS_HASH`` núcleos, por mais sessões que tentem logar ao mesmo
+tempo, e contas/IPs bloqueados são recusados antes de qualquer hash.
+"""
+import base64
+import hashlib
+import hmac
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ====================== CONFIGURAÇÕES ======================
+ALGORITMO = "pbkdf2_sha256"
+ITERACOES = 600_000
+ITERACOES_LEGADO = 100_000
+THREADS_HASH = 2
+
+MAX_FALHAS_USUARIO = 5
+MAX_FALHAS_IP = 20
+JANELA_FALHAS_S = 15 * 60
+BLOQUEIO_BASE_S = 30
+BLOQUEIO_MAX_S = 15 * 60
+
+COLUNAS_USUARIO = "username, password_hash, salt, role, nome_completo, apartamento"
+
+_hasher = ThreadPoolExecutor(max_workers=THREADS_HASH, thread_name_prefix="pbkdf2")
+
+
+# ====================== HASH ======================
+def gerar_salt() -> str:
+    return base64.b64encode(secrets.token_bytes(16)).decode()
+
+def _pbkdf2(senha: str, salt: str, iteracoes: int) -> str:
+    dk = hashlib.pbkdf2_hmac("sha256", senha.encode("utf-8"), base64.b64decode(salt), iteracoes)
+    return base64.b64encode(dk).decode()
+
+def _calcular(senha: str, salt: str, iteracoes: int) -> str:
+    return _hasher.submit(_pbkdf2, senha, salt, iteracoes).result()
+
+def _parametros(password_hash: str):
+    """Devolve (iterações, hash em base64) de um valor de ``password_hash``."""
+    partes = password_hash.split("$")
+    if len(partes) == 3 and partes[0] == ALGORITMO:
+        return int(partes[1]), partes[2]
+    return ITERACOES_LEGADO, password_hash
+
+def criar_hash(senha: str):
+    """Devolve (password_hash, salt) com os parâmetros atuais."""
+    salt = gerar_salt()
+    return f"{ALGORITMO}${ITERACOES}${_calcular(senha, salt, ITERACOES)}", salt
+
+def verificar_senha(senha: str, password_hash: str, salt: str) -> bool:
+    iteracoes, esperado = _parametros(password_hash)
+    return hmac.compare_digest(_calcular(senha, salt, iteracoes), esperado)
+
+def precisa_rehash(password_hash: str) -> bool:
+    return _parametros(password_hash)[0] != ITERACOES
+
+
+# ====================== LIMITE DE TENTATIVAS ======================
+def _chaves(identificador: str, ip, row=None):
+    # Conta encontrada: o limite é dela, por qualquer identificador (usuário, e-mail ou apartamento)
+    usuario = row[0] if row else identificador.strip().lower()
+    chaves = [(f"usuario:{usuario}", MAX_FALHAS_USUARIO)]
+    if ip:
+        chaves.append((f"ip:{ip}", MAX_FALHAS_IP))
+    return chaves
+
+def _espera(conn, chaves, agora: float) -> int:
+    nomes = [chave for chave, _ in chaves]
+    row = conn.execute(f"""
+        SELECT MAX(bloqueado_ate) FROM tentativas_login
+        WHERE chave IN ({', '.join('?' * len(nomes))})
+    """, nomes).fetchone()
+    return max(0, int(row[0] - agora) + 1) if row[0] and row[0] > agora else 0
+
+def _registrar_falha(conn, chave: str, max_falhas: int, agora: float):
+    # Falhas fora da janela e sem bloqueio em vigor não contam mais: saem, para a tabela não crescer
+    # com identificadores inventados que nunca chegam a um login bem-sucedido
+    conn.execute("""
+        DELETE FROM tentativas_login
+        WHERE ultima_falha < ? AND (bloqueado_ate IS NULL OR bloqueado_ate < ?)
+    """, (agora - JANELA_FALHAS_S, agora))
+    row = conn.execute("SELECT falhas, ultima_falha FROM tentativas_login WHERE chave = ?", (chave,)).fetchone()
+    falhas = row[0] + 1 if row and agora - row[1] < JANELA_FALHAS_S else 1
+    bloqueado_ate = None
+    if falhas >= max_falhas:
+        # Bloqueio dobra a cada falha além do limite, até BLOQUEIO_MAX_S
+        bloqueado_ate = agora + min(BLOQUEIO_BASE_S * 2 ** (falhas - max_falhas), BLOQUEIO_MAX_S)
+    conn.execute("""
+        INSERT OR REPLACE INTO tentativas_login (chave, falhas, ultima_falha, bloqueado_ate)
+        VALUES (?, ?, ?, ?)
+    """, (chave, falhas, agora, bloqueado_ate))
+
+
+# ====================== LOGIN ======================
+def buscar_usuario(conn, identificador: str):
+    # Uma busca indexada por tipo de identificador, em vez de um OR que varre a tabela
+    for coluna in ("username", "email", "apartamento"):
+        row = conn.execute(f"""
+            SELECT {COLUNAS_USUARIO} FROM usuarios
+            WHERE {coluna} = ? AND ativo = 1
+        """, (identificador,)).fetchone()
+        if row:
+            return row
+    return None
+
+def autenticar(banco, identificador: str, senha: str, ip=None):
+    """Tenta o login e devolve (usuário, segundos de espera).
+
+    Usuário é a linha ``COLUNAS_USUARIO`` ou None. Quando a conta ou o IP está
+    bloqueado, a senha nem é verificada e a espera vem maior que zero.
+    """
+    agora = time.time()
+    with banco.conexao() as conn:
+        row = buscar_usuario(conn, identificador)
+        chaves = _chaves(identificador, ip, row)
+        espera = _espera(conn, chaves, agora)
+    if espera:
+        return None, espera
+
+    if row and verificar_senha(senha, row[1], row[2]):
+        # Hash novo calculado fora da transação para não segurar o lock de escrita
+        rehash = criar_hash(senha) if precisa_rehash(row[1]) else None
+        with banco.transacao() as conn:
+            conn.execute("DELETE FROM tentativas_login WHERE chave = ?", (chaves[0][0],))
+            if rehash:
+                conn.execute("UPDATE usuarios SET password_hash = ?, salt = ? WHERE username = ?",
+                             (*rehash, row[0]))
+        return row, 0
+
+    with banco.transacao() as conn:
+        for chave, max_falhas in chaves:
+            _registrar_falha(conn, chave, max_falhas, agora)
+        espera = _espera(conn, chaves, agora)
+    return None, espera
@@ -0,0 +1,88 @@
+"""Conexões SQLite reaproveitadas entre reruns, em modo WAL.
+
+Um ``Banco`` por processo guarda um pequeno pool de conexões já configuradas.
+Cada rerun do Streamlit pega uma conexão emprestada e a devolve ao terminar,
+em vez de abrir e fechar o arquivo a cada comando. Em WAL os leitores não
+bloqueiam o escritor, e ``busy_timeout`` faz escritas concorrentes esperarem
+a vez em vez de falharem com "database is locked".
+"""
+import queue
+import sqlite3
+from contextlib import contextmanager
+
+# ====================== CONFIGURAÇÕES ======================
+TAMANHO_POOL = 8
+BUSY_TIMEOUT_MS = 5_000
+CACHE_KB = 16_384
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+    # Em WAL, NORMAL só sincroniza no checkpoint: commits sem fsync e sem risco de corromper o banco
+    "PRAGMA synchronous = NORMAL",
+    f"PRAGMA cache_size = -{CACHE_KB}",
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+class Banco:
+    def __init__(self, caminho: str, tamanho_pool: int = TAMANHO_POOL, diagnostico=None):
+        self.caminho = caminho
+        # Opcional: um condominio.diagnostico.Diagnostico que mede cada consulta
+        self.diagnostico = diagnostico
+        self._livres = queue.LifoQueue(maxsize=tamanho_pool)
+
+    def _abrir(self) -> sqlite3.Connection:
+        # isolation_level=None: leituras não abrem transação implícita que seguraria o WAL;
+        # escritas usam transacao(), que abre BEGIN IMMEDIATE explicitamente
+        conectar = self.diagnostico.conectar if self.diagnostico else sqlite3.connect
+        conn = conectar(self.caminho, check_same_thread=False, isolation_level=None,
+                        timeout=BUSY_TIMEOUT_MS / 1000)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _pegar(self) -> sqlite3.Connection:
+        try:
+            return self._livres.get_nowait()
+        except queue.Empty:
+            return self._abrir()
+
+    def _devolver(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        if self.diagnostico:
+            self.diagnostico.concluir(conn)
+        try:
+            self._livres.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    @contextmanager
+    def conexao(self):
+        """Conexão emprestada do pool para leituras (cada comando é autocommit)."""
+        conn = self._pegar()
+        try:
+            yield conn
+        finally:
+            self._devolver(conn)
+
+    @contextmanager
+    def transacao(self):
+        """Conexão com transação aberta: commit ao sair, rollback se houver exceção."""
+        with self.conexao() as conn:
+            # IMMEDIATE reserva a escrita já no início: a espera pelo lock cai no busy_timeout
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def fechar(self):
+        while True:
+            try:
+                self._livres.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,90 @@
+"""Busca textual (FTS5) em ocorrências e moradores, com ranking bm25 e paginação.
+
+Os índices ``ocorrencias_fts`` e ``usuarios_fts`` são mantidos por triggers
+(migração 7). O rowid de cada índice acompanha o rowid da tabela de origem,
+mas os resultados são ligados pela chave (id / username): uma entrada velha
+depois de um VACUUM nunca aparece como resultado errado, e
+``reconstruir_indices`` realinha tudo.
+"""
+import re
+import sqlite3
+
+import pandas as pd
+
+TAMANHO_PAGINA_BUSCA = 20
+
+INDICES = {
+    # índice: (tabela de origem, chave, colunas indexadas)
+    "ocorrencias_fts": ("ocorrencias", "id", ("descricao", "local_detalhado")),
+    "usuarios_fts": ("usuarios", "username", ("nome_completo", "apartamento", "email")),
+}
+
+
+# ====================== ESQUEMA ======================
+def criar_indices(conn: sqlite3.Connection):
+    for indice, (tabela, chave, colunas) in INDICES.items():
+        lista = ", ".join(colunas)
+        novos = ", ".join(f"new.{c}" for c in colunas)
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {indice}
+            USING fts5({chave} UNINDEXED, {lista}, tokenize = 'unicode61 remove_diacritics 2')
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {indice}_ai AFTER INSERT ON {tabela} BEGIN
+                INSERT INTO {indice} (rowid, {chave}, {lista}) VALUES (new.rowid, new.{chave}, {novos});
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {indice}_ad AFTER DELETE ON {tabela} BEGIN
+                DELETE FROM {indice} WHERE rowid = old.rowid;
+            END
+        """)
+        # Só quando muda texto indexado: mudanças de status não reescrevem o índice
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {indice}_au AFTER UPDATE OF {chave}, {lista} ON {tabela} BEGIN
+                DELETE FROM {indice} WHERE rowid = old.rowid;
+                INSERT INTO {indice} (rowid, {chave}, {lista}) VALUES (new.rowid, new.{chave}, {novos});
+            END
+        """)
+    reconstruir_indices(conn)
+
+def reconstruir_indices(conn: sqlite3.Connection):
+    """Recria o conteúdo dos índices a partir das tabelas (por exemplo, depois de um VACUUM)."""
+    for indice, (tabela, chave, colunas) in INDICES.items():
+        lista = ", ".join(colunas)
+        conn.execute(f"DELETE FROM {indice}")
+        conn.execute(f"INSERT INTO {indice} (rowid, {chave}, {lista}) SELECT rowid, {chave}, {lista} FROM {tabela}")
+
+
+# ====================== CONSULTA ======================
+def consulta_fts(texto: str) -> str:
+    """Converte o texto digitado em consulta FTS5: todos os termos, cada um como prefixo.
+
+    Cada termo vai entre aspas para que operadores e pontuação digitados pelo
+    usuário não sejam interpretados pela sintaxe do FTS5.
+    """
+    termos = re.findall(r"\w+", texto or "")
+    return " ".join(f'"{termo}"*' for termo in termos)
+
+def _buscar(conn, indice: str, colunas: str, texto: str, pagina: int, tamanho: int, filtro: str = ""):
+    consulta = consulta_fts(texto)
+    if not consulta:
+        return pd.DataFrame(), 0
+    tabela, chave, _ = INDICES[indice]
+    juncao = f"FROM {indice} f JOIN {tabela} t ON t.{chave} = f.{chave} WHERE {indice} MATCH ? {filtro}"
+    total = conn.execute(f"SELECT COUNT(*) {juncao}", (consulta,)).fetchone()[0]
+    df = pd.read_sql_query(f"""
+        SELECT {colunas} {juncao}
+        ORDER BY bm25({indice})
+        LIMIT ? OFFSET ?
+    """, conn, params=(consulta, tamanho, pagina * tamanho))
+    return df, total
+
+def buscar_ocorrencias(conn: sqlite3.Connection, texto: str, pagina: int = 0, tamanho: int = TAMANHO_PAGINA_BUSCA):
+    """Página ``pagina`` (a partir de 0) dos chamados mais relevantes e o total de resultados."""
+    return _buscar(conn, "ocorrencias_fts", """t.id, t.tipo_registro, t.categoria, t.local_detalhado,
+        t.descricao, t.status, t.data_envio, t.criado_por""", texto, pagina, tamanho)
+
+def buscar_moradores(conn: sqlite3.Connection, texto: str, pagina: int = 0, tamanho: int = TAMANHO_PAGINA_BUSCA):
+    return _buscar(conn, "usuarios_fts", """t.username, t.nome_completo, t.apartamento, t.email,
+        t.telefone, t.data_cadastro, t.ativo""", texto, pagina, tamanho, "AND t.role = 'morador'")
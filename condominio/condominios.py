@@ -0,0 +1,205 @@
+"""Modo multicondomínio: um arquivo SQLite por condomínio, aberto sob demanda.
+
+``Condominios`` guarda o catálogo (``catalogo.db`` na pasta) e os condomínios
+abertos, cada um com o seu ``Banco`` (pool próprio), ``Configuracoes`` e
+``Despachante``. Um condomínio só é aberto, e tem o esquema atualizado, no
+primeiro acesso; passando de ``max_abertos``, o usado há mais tempo é fechado.
+Como cada prédio escreve no próprio arquivo, o lock de escrita do SQLite de
+um não segura os outros.
+
+Usuários e papéis ficam dentro do arquivo de cada condomínio: o admin de um
+condomínio não existe nos outros.
+
+As fotos continuam na pasta única de ``condominio.fotos``: são endereçadas
+pelo conteúdo, então dois condomínios nunca disputam o mesmo arquivo.
+
+Uso:
+    python -m condominio.condominios PASTA criar jardim-das-flores "Residencial Jardim das Flores" [--senha-admin ...]
+    python -m condominio.condominios PASTA importar jardim-das-flores "..." condominio.db
+    python -m condominio.condominios PASTA listar
+"""
+import argparse
+import getpass
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from condominio.banco import Banco
+from condominio.configuracoes import Configuracoes
+from condominio.datas import agora
+from condominio.notificacoes import Despachante
+from condominio.servicos import Servicos
+
+CATALOGO = "catalogo.db"
+MAX_ABERTOS = 32
+TAMANHO_POOL_CONDOMINIO = 4
+# O identificador vira nome de arquivo e parte da URL
+_IDENTIFICADOR = re.compile(r"^[a-z0-9][a-z0-9-]{0,62}$")
+
+
+class CondominioDesconhecido(LookupError):
+    """Identificador que não está no catálogo."""
+
+
+class Condominios:
+    def __init__(self, pasta: str, max_abertos: int = MAX_ABERTOS, diagnostico=None, envio=None):
+        """``envio(identificador)`` devolve o envio de notificações do condomínio; sem ele, não há despacho.
+
+        ``diagnostico(identificador)``, se dado, cria o ``Diagnostico`` de cada condomínio aberto.
+        """
+        self.pasta = pasta
+        self._max_abertos = max_abertos
+        self._diagnostico = diagnostico
+        self._envio = envio
+        self._abertos = OrderedDict()
+        self._aberturas = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(pasta, exist_ok=True)
+        self._catalogo = Banco(os.path.join(pasta, CATALOGO), tamanho_pool=2)
+        with self._catalogo.transacao() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS condominios (
+                    identificador TEXT PRIMARY KEY,
+                    nome TEXT NOT NULL,
+                    criado_em TEXT NOT NULL
+                )
+            """)
+
+    def caminho(self, identificador: str) -> str:
+        return os.path.join(self.pasta, f"{identificador}.db")
+
+    # ====================== CATÁLOGO ======================
+    def listar(self) -> list:
+        """``(identificador, nome)`` de todos os condomínios, por nome."""
+        with self._catalogo.conexao() as conn:
+            return conn.execute("SELECT identificador, nome FROM condominios ORDER BY nome").fetchall()
+
+    def nome(self, identificador: str):
+        with self._catalogo.conexao() as conn:
+            row = conn.execute("SELECT nome FROM condominios WHERE identificador = ?", (identificador,)).fetchone()
+        return row[0] if row else None
+
+    def criar(self, identificador: str, nome: str, senha_admin: str, origem: str = None):
+        """Cadastra o condomínio; ``origem`` é um banco existente (ex.: o condominio.db do modo único) a copiar.
+
+        ``senha_admin`` é a senha do usuário admin criado no banco novo (ou no copiado, se ele não
+        tiver um): a API expõe o login de cada condomínio, então não há senha padrão aqui.
+        """
+        if not _IDENTIFICADOR.match(identificador or ""):
+            raise ValueError("Identificador inválido: use letras minúsculas, números e hífen")
+        if not (nome or "").strip():
+            raise ValueError("Informe o nome do condomínio")
+        if not senha_admin:
+            raise ValueError("Informe a senha inicial do admin")
+        caminho = self.caminho(identificador)
+        if os.path.exists(caminho):
+            raise ValueError(f"Já existe um banco em {caminho}")
+        try:
+            with self._catalogo.transacao() as conn:
+                conn.execute("INSERT INTO condominios (identificador, nome, criado_em) VALUES (?, ?, ?)",
+                             (identificador, nome.strip(), agora()))
+                if origem:
+                    # API de backup: cópia consistente mesmo com o banco de origem em uso
+                    fonte, destino = sqlite3.connect(origem), sqlite3.connect(caminho)
+                    try:
+                        fonte.backup(destino)
+                    finally:
+                        fonte.close()
+                        destino.close()
+        except sqlite3.IntegrityError:
+            raise ValueError("Condomínio já cadastrado.") from None
+        # O esquema e o admin, com a senha dada, ficam prontos antes do primeiro acesso
+        banco = Banco(caminho, tamanho_pool=1)
+        try:
+            Servicos(banco).inicializar(senha_admin)
+        finally:
+            banco.fechar()
+        self.servicos(identificador)
+
+    # ====================== CONDOMÍNIOS ABERTOS ======================
+    def servicos(self, identificador: str) -> Servicos:
+        """Os ``Servicos`` do condomínio, abrindo-o se preciso; ``CondominioDesconhecido`` se não existir."""
+        with self._lock:
+            servicos = self._abertos.get(identificador)
+            if servicos is not None:
+                self._abertos.move_to_end(identificador)
+                return servicos
+            trava = self._aberturas.setdefault(identificador, threading.Lock())
+
+        # A abertura (e uma eventual migração) de um condomínio não trava os demais
+        with trava:
+            with self._lock:
+                servicos = self._abertos.get(identificador)
+            if servicos is None:
+                try:
+                    servicos = self._abrir(identificador)
+                except BaseException:
+                    with self._lock:
+                        self._aberturas.pop(identificador, None)
+                    raise
+                # Entra em _abertos e solta a trava de abertura de uma vez: quem chegar depois
+                # acha o condomínio aberto, em vez de criar outra trava e abri-lo de novo
+                with self._lock:
+                    self._abertos[identificador] = servicos
+                    self._aberturas.pop(identificador, None)
+                    fechar = [self._abertos.popitem(last=False)[1]
+                              for _ in range(len(self._abertos) - self._max_abertos)]
+                # Sessões que ainda têm a referência continuam funcionando: o pool reabre conexões
+                # sob demanda. Notificações pendentes ficam na caixa de saída até a próxima abertura
+                # ou até o "python -m condominio.manutencao --pasta ... notificacoes" do cron.
+                for antigo in fechar:
+                    antigo.fechar()
+        return servicos
+
+    def _abrir(self, identificador: str) -> Servicos:
+        if self.nome(identificador) is None:
+            raise CondominioDesconhecido(f"Condomínio desconhecido: {identificador}")
+        banco = Banco(self.caminho(identificador), tamanho_pool=TAMANHO_POOL_CONDOMINIO,
+                      diagnostico=self._diagnostico(identificador) if self._diagnostico else None)
+        Servicos(banco).inicializar()
+        despachante = Despachante(banco, self._envio(identificador)).iniciar() if self._envio else None
+        return Servicos(banco, Configuracoes(banco), despachante)
+
+    def abertos(self) -> list:
+        with self._lock:
+            return list(self._abertos)
+
+    def fechar(self):
+        with self._lock:
+            abertos, self._abertos = list(self._abertos.values()), OrderedDict()
+        for servicos in abertos:
+            servicos.fechar()
+        self._catalogo.fechar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Catálogo de condomínios do modo multicondomínio.")
+    parser.add_argument("pasta")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    comandos.add_parser("listar")
+    criar = comandos.add_parser("criar")
+    criar.add_argument("identificador")
+    criar.add_argument("nome")
+    criar.add_argument("--senha-admin", help="senha inicial do admin (sem ela, é pedida no terminal)")
+    importar = comandos.add_parser("importar", help="cadastra a partir de um banco existente")
+    importar.add_argument("identificador")
+    importar.add_argument("nome")
+    importar.add_argument("origem")
+    importar.add_argument("--senha-admin", help="senha do admin, se o banco de origem não tiver um")
+    args = parser.parse_args()
+
+    condominios = Condominios(args.pasta)
+    if args.comando == "listar":
+        for identificador, nome in condominios.listar():
+            print(f"{identificador}\t{nome}")
+    else:
+        try:
+            senha_admin = args.senha_admin or getpass.getpass("Senha inicial do admin: ")
+            condominios.criar(args.identificador, args.nome, senha_admin, getattr(args, "origem", None))
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Condomínio {args.identificador} pronto em {condominios.caminho(args.identificador)}")
+    condominios.fechar()
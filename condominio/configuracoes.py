@@ -0,0 +1,61 @@
+"""Configurações e dados de referência (tabela config) em memória, com TTL.
+
+Um ``Configuracoes`` por processo guarda uma cópia da tabela inteira: leituras
+não tocam no SQLite enquanto a cópia for válida. ``salvar`` grava e invalida
+na hora; o TTL cobre alterações feitas por outros processos.
+"""
+import threading
+import time
+
+# ====================== CHAVES ======================
+CHAVE_WHATSAPP = "whatsapp_urgente_link"
+CHAVE_CATEGORIAS = "categorias"
+
+CATEGORIAS_PADRAO = ["Corredor", "Garagem", "Jardim", "Academia", "Elevador", "Piscina", "Outros"]
+TTL_S = 60
+
+
+class Configuracoes:
+    def __init__(self, banco, ttl: float = TTL_S):
+        self._banco = banco
+        self._ttl = ttl
+        # (valores, carregado_em) num atributo só: quem lê pega os dois de uma vez
+        self._atual = None
+        self._lock = threading.Lock()
+
+    def _valido(self, atual) -> bool:
+        return atual is not None and time.monotonic() - atual[1] < self._ttl
+
+    def _copia(self) -> dict:
+        # Lido uma vez para a variável local: invalidar() pode zerar o atributo entre a conferência e o uso
+        atual = self._atual
+        if not self._valido(atual):
+            with self._lock:
+                # Outra sessão pode ter recarregado enquanto esperávamos o lock
+                atual = self._atual
+                if not self._valido(atual):
+                    with self._banco.conexao() as conn:
+                        valores = dict(conn.execute("SELECT chave, valor FROM config").fetchall())
+                    atual = self._atual = (valores, time.monotonic())
+        return atual[0]
+
+    def obter(self, chave: str, padrao=None):
+        valor = self._copia().get(chave)
+        return padrao if valor is None else valor
+
+    def lista(self, chave: str, padrao=()) -> list:
+        """Valor guardado como um item por linha (ex.: categorias)."""
+        itens = [item.strip() for item in (self.obter(chave) or "").splitlines() if item.strip()]
+        return itens or list(padrao)
+
+    def categorias(self) -> list:
+        return self.lista(CHAVE_CATEGORIAS, CATEGORIAS_PADRAO)
+
+    def salvar(self, valores: dict):
+        with self._banco.transacao() as conn:
+            conn.executemany("INSERT OR REPLACE INTO config (chave, valor) VALUES (?, ?)", valores.items())
+        self.invalidar()
+
+    def invalidar(self):
+        with self._lock:
+            self._atual = None
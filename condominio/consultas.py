@@ -0,0 +1,138 @@
+"""Consultas de leitura das páginas, com projeção explícita de colunas por tela.
+
+Nenhuma consulta de listagem traz a foto: as telas recebem só ``tem_foto`` e
+buscam a referência da foto por protocolo quando o usuário pede para vê-la.
+"""
+import sqlite3
+
+import pandas as pd
+
+# Status em aberto listados explicitamente: "status != 'Concluído'" não usa índice
+STATUS_ABERTOS = ("Pendente", "Em Manutenção")
+TAMANHO_PAGINA = 20
+
+# ====================== PROJEÇÕES ======================
+COLUNAS_FILA = """id, tipo_registro, categoria, local_detalhado, descricao, status,
+    data_envio, criado_por, foto_hash IS NOT NULL AS tem_foto"""
+
+COLUNAS_MORADOR = """id, categoria, status, local_detalhado, descricao, data_envio,
+    data_conclusao, foto_hash IS NOT NULL AS tem_foto"""
+
+COLUNAS_PROTOCOLO = """id, status, descricao, data_envio, data_conclusao, foto_hash"""
+
+
+# ====================== LISTAGENS ======================
+def _status_fila(filtros: dict) -> list:
+    return [s for s in filtros.get("status") or () if s in STATUS_ABERTOS] or list(STATUS_ABERTOS)
+
+def _filtros_fila(filtros: dict, status=None):
+    """Monta o WHERE da fila a partir de status, categoria, tipo_registro e período.
+
+    ``desde``/``ate`` são datas ISO ("aaaa-mm-dd"); ``ate`` é exclusivo. ``status``,
+    se dado, substitui o dos filtros.
+    """
+    status = status or _status_fila(filtros)
+    condicoes = [f"status IN ({', '.join('?' * len(status))})"]
+    params = list(status)
+    for coluna in ("categoria", "tipo_registro"):
+        valores = filtros.get(coluna)
+        if valores:
+            condicoes.append(f"{coluna} IN ({', '.join('?' * len(valores))})")
+            params += list(valores)
+    if filtros.get("desde"):
+        condicoes.append("data_envio >= ?")
+        params.append(filtros["desde"])
+    if filtros.get("ate"):
+        condicoes.append("data_envio < ?")
+        params.append(filtros["ate"])
+    return " AND ".join(condicoes), params
+
+def pagina_pendentes(conn: sqlite3.Connection, filtros: dict, cursor=None, limite: int = TAMANHO_PAGINA):
+    """Uma página da fila, mais recentes primeiro, e o cursor da página seguinte (ou None).
+
+    Paginação por chave (data_envio, id) em vez de OFFSET, com uma consulta por
+    status: cada uma percorre o índice (status, data_envio) a partir do cursor e
+    para na página, e as listas são intercaladas aqui. Um único ``status IN (...)``
+    ordenaria todos os chamados em aberto a cada página.
+    """
+    partes = []
+    for status in _status_fila(filtros):
+        where, params = _filtros_fila(filtros, [status])
+        if cursor:
+            where += " AND (data_envio < ? OR (data_envio = ? AND id < ?))"
+            params += [cursor[0], cursor[0], cursor[1]]
+        partes.append(pd.read_sql_query(f"""
+            SELECT {COLUNAS_FILA} FROM ocorrencias
+            WHERE {where}
+            ORDER BY data_envio DESC, id DESC
+            LIMIT ?
+        """, conn, params=params + [limite + 1]))
+    df = partes[0] if len(partes) == 1 else pd.concat(partes, ignore_index=True)
+    df = df.sort_values(["data_envio", "id"], ascending=False, ignore_index=True)
+    if len(df) <= limite:
+        return df, None
+    df = df.iloc[:limite]
+    ultima = df.iloc[-1]
+    return df, (ultima["data_envio"], ultima["id"])
+
+def contar_pendentes(conn: sqlite3.Connection, filtros: dict) -> dict:
+    where, params = _filtros_fila(filtros)
+    return dict(conn.execute(f"""
+        SELECT status, COUNT(*) FROM ocorrencias
+        WHERE {where}
+        GROUP BY status
+    """, params).fetchall())
+
+def protocolos_pendentes(conn: sqlite3.Connection, filtros: dict) -> list:
+    """Todos os protocolos da fila que atendem aos filtros, para ações em massa."""
+    where, params = _filtros_fila(filtros)
+    return [row[0] for row in conn.execute(f"SELECT id FROM ocorrencias WHERE {where}", params)]
+
+def linhas_fila(conn: sqlite3.Connection, filtros: dict, protocolos) -> pd.DataFrame:
+    """Dos ``protocolos`` dados, os que ainda estão na fila com esses filtros (sem ordem)."""
+    protocolos = list(protocolos)
+    where, params = _filtros_fila(filtros)
+    return pd.read_sql_query(f"""
+        SELECT {COLUNAS_FILA} FROM ocorrencias
+        WHERE {where} AND id IN ({', '.join('?' * len(protocolos))})
+    """, conn, params=params + protocolos)
+
+def listar_do_morador(conn: sqlite3.Connection, username: str) -> pd.DataFrame:
+    return pd.read_sql_query(f"""
+        SELECT {COLUNAS_MORADOR} FROM ocorrencias
+        WHERE criado_por = ?
+        ORDER BY data_envio DESC
+    """, conn, params=(username,))
+
+
+# ====================== REGISTRO ÚNICO ======================
+def buscar_protocolo(conn: sqlite3.Connection, protocolo: str):
+    cur = conn.execute(f"SELECT {COLUNAS_PROTOCOLO} FROM ocorrencias WHERE id = ?", (protocolo,))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return dict(zip([c[0] for c in cur.description], row))
+
+def buscar_foto(conn: sqlite3.Connection, protocolo: str):
+    row = conn.execute("SELECT foto_hash FROM ocorrencias WHERE id = ?", (protocolo,)).fetchone()
+    return row[0] if row else None
+
+def listar_historico(conn: sqlite3.Connection, protocolo: str) -> list:
+    return conn.execute("""
+        SELECT status_novo, alterado_em, alterado_por FROM historico_status
+        WHERE ocorrencia_id = ?
+        ORDER BY alterado_em, id
+    """, (protocolo,)).fetchall()
+
+def versao_ocorrencias(conn: sqlite3.Connection) -> int:
+    """Muda a cada abertura, mudança de status ou exclusão: serve de chave de cache.
+
+    Toda escrita em ocorrencias passa por ``condominio.ocorrencias``, que registra
+    a transição em historico_status; MAX(id) da tabela é lido direto da árvore.
+    """
+    return conn.execute("SELECT MAX(id) FROM historico_status").fetchone()[0] or 0
+
+def mudancas_desde(conn: sqlite3.Connection, versao: int) -> set:
+    """Protocolos abertos, alterados ou excluídos depois de ``versao`` (ver ``versao_ocorrencias``)."""
+    return {row[0] for row in conn.execute(
+        "SELECT DISTINCT ocorrencia_id FROM historico_status WHERE id > ?", (versao,))}
@@ -0,0 +1,63 @@
+"""Datas das ocorrências: gravadas em ISO 8601 (ordenável), exibidas em pt-BR."""
+import sqlite3
+from datetime import datetime
+
+# ====================== FORMATOS ======================
+# Mesmo formato de datetime('now','localtime') do SQLite, usado em usuarios.data_cadastro
+FORMATO_BANCO = "%Y-%m-%d %H:%M:%S"
+FORMATO_EXIBICAO = "%d/%m/%Y %H:%M"
+_GLOB_LEGADO = "[0-3][0-9]/[01][0-9]/[0-9][0-9][0-9][0-9] [0-2][0-9]:[0-5][0-9]"
+
+
+def agora() -> str:
+    return datetime.now().strftime(FORMATO_BANCO)
+
+def data_banco(valor) -> str:
+    """Data ISO 8601 recebida de fora no formato do banco; ``ValueError`` se não for uma data."""
+    try:
+        data = datetime.fromisoformat(valor)
+    except (TypeError, ValueError):
+        raise ValueError("Data inválida: use ISO 8601 (aaaa-mm-dd hh:mm:ss)") from None
+    if data.tzinfo is not None:
+        # Com fuso: convertida para a hora local, como as demais datas do banco
+        data = data.astimezone().replace(tzinfo=None)
+    return data.strftime(FORMATO_BANCO)
+
+def formatar_data(valor) -> str:
+    if not valor:
+        return ""
+    try:
+        return datetime.fromisoformat(valor).strftime(FORMATO_EXIBICAO)
+    except (TypeError, ValueError):
+        return str(valor)
+
+def formatar_duracao(delta) -> str:
+    dias = delta.days
+    horas = delta.seconds // 3600
+    minutos = (delta.seconds // 60) % 60
+    partes = []
+    if dias: partes.append(f"{dias}d")
+    if horas: partes.append(f"{horas}h")
+    if minutos or not partes: partes.append(f"{minutos}min")
+    return " ".join(partes)
+
+def calcular_tempo_finalizacao(inicio_str, fim_str):
+    try:
+        return formatar_duracao(datetime.fromisoformat(fim_str) - datetime.fromisoformat(inicio_str))
+    except (TypeError, ValueError):
+        return "N/A"
+
+
+# ====================== MIGRAÇÃO ======================
+def migrar_datas_iso(conn: sqlite3.Connection) -> int:
+    """Converte data_envio/data_conclusao de "dd/mm/aaaa hh:mm" para ISO 8601 (sem commit)."""
+    total = 0
+    for coluna in ("data_envio", "data_conclusao"):
+        cur = conn.execute(f"""
+            UPDATE ocorrencias
+            SET {coluna} = substr({coluna}, 7, 4) || '-' || substr({coluna}, 4, 2) || '-' ||
+                           substr({coluna}, 1, 2) || ' ' || substr({coluna}, 12, 5) || ':00'
+            WHERE {coluna} GLOB ?
+        """, (_GLOB_LEGADO,))
+        total += cur.rowcount
+    return total
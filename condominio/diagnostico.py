@@ -0,0 +1,264 @@
+"""Instrumentação dos reruns: tempo de cada consulta SQL e de cada seção da página.
+
+Com um ``Diagnostico`` ligado ao ``Banco``, toda conexão do pool é uma
+``ConexaoMedida``: cada ``execute`` (inclusive os do ``pd.read_sql_query``) e
+cada leitura das linhas do cursor somam tempo e linhas num registro da consulta.
+Quando a conexão volta ao pool as consultas dela estão completas e as que
+passaram do limite vão para o log de consultas lentas.
+
+A página marca o início do rerun, o começo de cada seção (``secao``) e o fim;
+trechos que não são SQL, como decodificar uma foto, entram com ``medir``.
+Fragmentos que rodam sozinhos (``st.fragment``) contam como reruns próprios.
+Os últimos reruns e consultas ficam em memória para a aba de diagnóstico.
+"""
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+log = logging.getLogger("condominio.consultas_lentas")
+
+# ====================== CONFIGURAÇÕES ======================
+CHAVE_LIMITE_LENTA = "limite_consulta_lenta_ms"
+LIMITE_LENTA_MS = 200
+HISTORICO_CONSULTAS = 2_000
+HISTORICO_RERUNS = 200
+FORA_DE_RERUN = "(segundo plano)"
+
+_ESPACOS = re.compile(r"\s+")
+
+
+def _texto(sql: str) -> str:
+    return _ESPACOS.sub(" ", sql).strip()
+
+
+# ====================== CONEXÃO ======================
+class CursorMedido(sqlite3.Cursor):
+    """Cursor que soma ao registro da última consulta o tempo e as linhas lidas."""
+
+    _registro = None
+
+    def _medir(self, metodo, *args):
+        t0 = time.perf_counter()
+        try:
+            return metodo(*args)
+        finally:
+            if self._registro is not None:
+                self._registro["ms"] += (time.perf_counter() - t0) * 1000
+
+    def execute(self, sql, parametros=()):
+        self._registro = self.connection.diagnostico._novo(self.connection, sql)
+        self._medir(super().execute, sql, parametros)
+        self._contar(0)
+        return self
+
+    def executemany(self, sql, parametros):
+        self._registro = self.connection.diagnostico._novo(self.connection, sql)
+        self._medir(super().executemany, sql, parametros)
+        self._contar(0)
+        return self
+
+    def _contar(self, lidas: int):
+        if self._registro is not None:
+            # Escritas informam rowcount; leituras contam as linhas buscadas
+            self._registro["linhas"] = self.rowcount if self.rowcount >= 0 else self._registro["linhas"] + lidas
+
+    def fetchone(self):
+        linha = self._medir(super().fetchone)
+        self._contar(linha is not None)
+        return linha
+
+    def fetchmany(self, *args):
+        linhas = self._medir(super().fetchmany, *args)
+        self._contar(len(linhas))
+        return linhas
+
+    def fetchall(self):
+        linhas = self._medir(super().fetchall)
+        self._contar(len(linhas))
+        return linhas
+
+    def __next__(self):
+        linha = self._medir(super().__next__)
+        self._contar(1)
+        return linha
+
+class ConexaoMedida(sqlite3.Connection):
+    diagnostico = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.consultas = []
+
+    def cursor(self, factory=CursorMedido):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor().executemany(sql, parametros)
+
+    def commit(self):
+        # O fsync do commit e o rollback também são tempo de banco do rerun
+        self._medir("COMMIT", super().commit)
+
+    def rollback(self):
+        self._medir("ROLLBACK", super().rollback)
+
+    def _medir(self, sql, metodo):
+        registro = self.diagnostico._novo(self, sql)
+        t0 = time.perf_counter()
+        metodo()
+        registro["ms"] += (time.perf_counter() - t0) * 1000
+
+
+# ====================== COLETA ======================
+class Diagnostico:
+    def __init__(self, limite_ms: float = LIMITE_LENTA_MS):
+        self.limite_ms = limite_ms
+        self._consultas = deque(maxlen=HISTORICO_CONSULTAS)
+        self._reruns = deque(maxlen=HISTORICO_RERUNS)
+        # Cada sessão do Streamlit roda o script na sua própria thread
+        self._local = threading.local()
+
+    def conectar(self, caminho: str, **kwargs) -> sqlite3.Connection:
+        conn = sqlite3.connect(caminho, factory=ConexaoMedida, **kwargs)
+        conn.diagnostico = self
+        return conn
+
+    def _novo(self, conn, sql: str):
+        if sql.lstrip()[:7].upper() == "EXPLAIN":
+            # Os planos pedidos pela aba de diagnóstico não entram na própria estatística
+            return None
+        rerun = getattr(self._local, "rerun", None)
+        registro = {
+            "quando": time.time(),
+            "pagina": rerun["pagina"] if rerun else FORA_DE_RERUN,
+            "secao": rerun["secao"] if rerun else FORA_DE_RERUN,
+            "sql": _texto(sql),
+            "linhas": 0,
+            "ms": 0.0,
+        }
+        self._consultas.append(registro)
+        conn.consultas.append(registro)
+        if rerun:
+            rerun["consultas"].append(registro)
+        return registro
+
+    def concluir(self, conn):
+        """Chamado pelo ``Banco`` ao devolver a conexão: as consultas dela terminaram."""
+        for registro in conn.consultas:
+            if registro["ms"] >= self.limite_ms:
+                log.warning("%.1f ms, %d linha(s) [%s / %s] %s", registro["ms"], registro["linhas"],
+                            registro["pagina"], registro["secao"], registro["sql"])
+        conn.consultas.clear()
+
+    # ====================== RERUNS ======================
+    def iniciar_rerun(self, pagina: str):
+        # st.rerun()/st.stop() interrompem o script antes do fim: fecha o que ficou aberto
+        self.finalizar_rerun(interrompido=True)
+        agora = time.perf_counter()
+        self._local.rerun = {
+            "quando": time.time(), "pagina": pagina, "secao": "Início",
+            "inicio": agora, "inicio_secao": agora, "secoes": {}, "consultas": [],
+        }
+
+    def secao(self, nome: str):
+        """Fecha a seção atual e começa ``nome``; seções repetidas acumulam."""
+        rerun = getattr(self._local, "rerun", None)
+        if rerun is None:
+            return
+        agora = time.perf_counter()
+        secoes = rerun["secoes"]
+        secoes[rerun["secao"]] = secoes.get(rerun["secao"], 0.0) + (agora - rerun["inicio_secao"]) * 1000
+        rerun["secao"], rerun["inicio_secao"] = nome, agora
+
+    def finalizar_rerun(self, interrompido: bool = False):
+        rerun = getattr(self._local, "rerun", None)
+        if rerun is None:
+            return
+        self.secao(None)
+        self._local.rerun = None
+        consultas = rerun["consultas"]
+        self._reruns.append({
+            "quando": rerun["quando"],
+            "pagina": rerun["pagina"],
+            "total_ms": (time.perf_counter() - rerun["inicio"]) * 1000,
+            "sql_ms": sum(c["ms"] for c in consultas),
+            "consultas": len(consultas),
+            "linhas": sum(c["linhas"] for c in consultas),
+            "secoes": {nome: ms for nome, ms in rerun["secoes"].items() if nome is not None},
+            "interrompido": interrompido,
+        })
+
+    @contextmanager
+    def fragmento(self, nome: str):
+        """Trecho de um ``st.fragment``: seção do rerun completo, ou um rerun próprio quando só o fragmento roda."""
+        if getattr(self._local, "rerun", None) is not None:
+            self.secao(nome)
+            yield
+            return
+        self.iniciar_rerun(nome)
+        try:
+            yield
+        except BaseException:
+            # st.rerun(scope="fragment") também sai por exceção
+            self.finalizar_rerun(interrompido=True)
+            raise
+        self.finalizar_rerun()
+
+    @contextmanager
+    def medir(self, nome: str):
+        """Mede um trecho que não é SQL (ex.: decodificar uma foto) como uma entrada da lista."""
+        rerun = getattr(self._local, "rerun", None)
+        registro = {
+            "quando": time.time(),
+            "pagina": rerun["pagina"] if rerun else FORA_DE_RERUN,
+            "secao": rerun["secao"] if rerun else FORA_DE_RERUN,
+            "sql": f"-- {nome}",
+            "linhas": 0,
+            "ms": 0.0,
+        }
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            registro["ms"] = (time.perf_counter() - t0) * 1000
+            self._consultas.append(registro)
+
+    # ====================== LEITURA ======================
+    def consultas_recentes(self) -> list:
+        return list(self._consultas)
+
+    def reruns_recentes(self) -> list:
+        return list(self._reruns)
+
+    def piores(self, quantidade: int = 10) -> list:
+        """Consultas agrupadas pelo texto, das que mais somaram tempo para as que menos."""
+        grupos = {}
+        for registro in self.consultas_recentes():
+            grupo = grupos.setdefault(registro["sql"], {"sql": registro["sql"], "execucoes": 0,
+                                                        "total_ms": 0.0, "max_ms": 0.0, "linhas": 0})
+            grupo["execucoes"] += 1
+            grupo["total_ms"] += registro["ms"]
+            grupo["max_ms"] = max(grupo["max_ms"], registro["ms"])
+            grupo["linhas"] += registro["linhas"]
+        ordenados = sorted(grupos.values(), key=lambda g: g["total_ms"], reverse=True)
+        for grupo in ordenados:
+            grupo["media_ms"] = grupo["total_ms"] / grupo["execucoes"]
+        return ordenados[:quantidade]
+
+
+def plano_consulta(conn, sql: str) -> list:
+    """``EXPLAIN QUERY PLAN`` de uma consulta registrada, com NULL nos parâmetros.
+
+    Só para leituras; devolve as linhas ``detail`` do plano.
+    """
+    if not re.match(r"\s*(SELECT|WITH)\b", sql, re.IGNORECASE):
+        return []
+    parametros = [None] * sql.count("?")
+    return [linha[-1] for linha in conn.execute(f"EXPLAIN QUERY PLAN {sql}", parametros).fetchall()]
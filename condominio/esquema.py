@@ -0,0 +1,234 @@
+"""Migrações numeradas do esquema, registradas na tabela ``schema_version``.
+
+Cada migração roda uma única vez por arquivo de banco. Bancos antigos (como os
+``condominio_final_v1x.db``) não têm ``schema_version`` e começam da versão 0;
+por isso toda migração precisa ser idempotente sobre um esquema parcial.
+"""
+import logging
+import sqlite3
+import sys
+
+from condominio.busca import criar_indices
+from condominio.configuracoes import CATEGORIAS_PADRAO, CHAVE_CATEGORIAS
+from condominio.datas import migrar_datas_iso
+from condominio.fotos import migrar_fotos_base64
+
+log = logging.getLogger(__name__)
+
+# ====================== MIGRAÇÕES ======================
+def _tabelas_base(conn: sqlite3.Connection):
+    conn.execute("""CREATE TABLE IF NOT EXISTS usuarios (
+        username TEXT PRIMARY KEY,
+        password_hash TEXT NOT NULL,
+        salt TEXT NOT NULL,
+        role TEXT NOT NULL,
+        nome_completo TEXT,
+        apartamento TEXT,
+        email TEXT UNIQUE,
+        telefone TEXT,
+        data_cadastro TEXT DEFAULT (datetime('now','localtime')),
+        ativo INTEGER DEFAULT 1
+    )""")
+
+    conn.execute("""CREATE TABLE IF NOT EXISTS ocorrencias (
+        id TEXT PRIMARY KEY,
+        tipo_registro TEXT,
+        categoria TEXT NOT NULL,
+        local_detalhado TEXT,
+        descricao TEXT NOT NULL,
+        foto_base64 TEXT,
+        status TEXT DEFAULT 'Pendente',
+        data_envio TEXT,
+        data_conclusao TEXT,
+        criado_por TEXT DEFAULT 'Anônimo'
+    )""")
+
+    # O snapshot v11 ainda não tinha a tabela config
+    conn.execute("""CREATE TABLE IF NOT EXISTS config (
+        chave TEXT PRIMARY KEY,
+        valor TEXT
+    )""")
+    conn.execute("INSERT OR IGNORE INTO config (chave, valor) VALUES ('whatsapp_urgente_link', '')")
+
+def _fotos_em_disco(conn: sqlite3.Connection):
+    colunas = {c[1] for c in conn.execute("PRAGMA table_info(ocorrencias)")}
+    if "foto_hash" not in colunas:
+        conn.execute("ALTER TABLE ocorrencias ADD COLUMN foto_hash TEXT")
+    migrar_fotos_base64(conn)
+
+def _indices_ocorrencias(conn: sqlite3.Connection):
+    # Fila de pendentes (o prefixo status também atende filtros só por status) e chamados por morador
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ocorrencias_status_data ON ocorrencias (status, data_envio)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ocorrencias_criado_por ON ocorrencias (criado_por, data_envio)")
+
+def _historico_status(conn: sqlite3.Connection):
+    conn.execute("""CREATE TABLE IF NOT EXISTS historico_status (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ocorrencia_id TEXT NOT NULL,
+        status_anterior TEXT,
+        status_novo TEXT NOT NULL,
+        alterado_em TEXT NOT NULL,
+        alterado_por TEXT
+    )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_historico_ocorrencia ON historico_status (ocorrencia_id, alterado_em)")
+    # Ocorrências anteriores ao histórico: abertura e, se houver, a conclusão gravada
+    conn.execute("""
+        INSERT INTO historico_status (ocorrencia_id, status_anterior, status_novo, alterado_em, alterado_por)
+        SELECT id, NULL, 'Pendente', data_envio, criado_por FROM ocorrencias
+        WHERE data_envio IS NOT NULL
+          AND id NOT IN (SELECT ocorrencia_id FROM historico_status)
+    """)
+    conn.execute("""
+        INSERT INTO historico_status (ocorrencia_id, status_anterior, status_novo, alterado_em, alterado_por)
+        SELECT id, NULL, status, data_conclusao, NULL FROM ocorrencias
+        WHERE data_conclusao IS NOT NULL
+          AND id NOT IN (SELECT ocorrencia_id FROM historico_status WHERE status_novo = ocorrencias.status)
+    """)
+
+def _login(conn: sqlite3.Connection):
+    # username e email já têm índice (PRIMARY KEY / UNIQUE); o login também busca por apartamento
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_usuarios_apartamento ON usuarios (apartamento)")
+    conn.execute("""CREATE TABLE IF NOT EXISTS tentativas_login (
+        chave TEXT PRIMARY KEY,
+        falhas INTEGER NOT NULL,
+        ultima_falha REAL NOT NULL,
+        bloqueado_ate REAL
+    )""")
+
+def _busca_textual(conn: sqlite3.Connection):
+    criar_indices(conn)
+
+def _categorias(conn: sqlite3.Connection):
+    conn.execute("INSERT OR IGNORE INTO config (chave, valor) VALUES (?, ?)",
+                 (CHAVE_CATEGORIAS, "\n".join(CATEGORIAS_PADRAO)))
+
+def _notificacoes(conn: sqlite3.Connection):
+    conn.execute("""CREATE TABLE IF NOT EXISTS notificacoes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        evento TEXT NOT NULL,
+        ocorrencia_id TEXT,
+        conteudo TEXT NOT NULL,
+        criada_em TEXT NOT NULL,
+        tentativas INTEGER NOT NULL DEFAULT 0,
+        proxima_tentativa REAL NOT NULL DEFAULT 0,
+        enviada_em TEXT,
+        erro TEXT
+    )""")
+    # Índice parcial: só a fila ainda não entregue, que é o que o despachante lê
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_notificacoes_pendentes ON notificacoes (proxima_tentativa, id)
+        WHERE enviada_em IS NULL
+    """)
+
+def _chave_inteira(conn: sqlite3.Connection):
+    """Recria ocorrencias com chave INTEGER (seq) e o protocolo (id) num índice único.
+
+    A chave TEXT aleatória espalhava cada INSERT pela árvore; com ``seq`` as
+    linhas entram no fim, na ordem de abertura. A coluna foto_base64 não é
+    copiada: o que a migração 2 não conseguiu decodificar vai antes para a
+    tabela ``fotos_nao_migradas``, para não se perder com a coluna.
+    """
+    colunas_antigas = {c[1] for c in conn.execute("PRAGMA table_info(ocorrencias)")}
+    if "foto_base64" in colunas_antigas:
+        restantes = conn.execute("SELECT COUNT(*) FROM ocorrencias WHERE foto_base64 IS NOT NULL").fetchone()[0]
+        if restantes:
+            conn.execute("""CREATE TABLE IF NOT EXISTS fotos_nao_migradas (
+                id TEXT PRIMARY KEY,
+                foto_base64 TEXT NOT NULL
+            )""")
+            conn.execute("""
+                INSERT OR REPLACE INTO fotos_nao_migradas (id, foto_base64)
+                SELECT id, foto_base64 FROM ocorrencias WHERE foto_base64 IS NOT NULL
+            """)
+            log.warning("%d foto(s) em base64 não migrada(s) guardada(s) em fotos_nao_migradas", restantes)
+    conn.execute("""CREATE TABLE ocorrencias_nova (
+        seq INTEGER PRIMARY KEY,
+        id TEXT NOT NULL UNIQUE,
+        tipo_registro TEXT,
+        categoria TEXT NOT NULL,
+        local_detalhado TEXT,
+        descricao TEXT NOT NULL,
+        status TEXT DEFAULT 'Pendente',
+        data_envio TEXT,
+        data_conclusao TEXT,
+        criado_por TEXT DEFAULT 'Anônimo',
+        foto_hash TEXT
+    )""")
+    colunas = """id, tipo_registro, categoria, local_detalhado, descricao, status,
+        data_envio, data_conclusao, criado_por, foto_hash"""
+    conn.execute(f"""
+        INSERT INTO ocorrencias_nova ({colunas})
+        SELECT {colunas} FROM ocorrencias ORDER BY data_envio, id
+    """)
+    # DROP leva junto os índices e os triggers da busca; são recriados logo abaixo
+    conn.execute("DROP TABLE ocorrencias")
+    conn.execute("ALTER TABLE ocorrencias_nova RENAME TO ocorrencias")
+    _indices_ocorrencias(conn)
+    criar_indices(conn)
+
+
+# Só acrescente no fim: a posição na lista é o número da versão
+MIGRACOES = [
+    (1, "Tabelas usuarios, ocorrencias e config", _tabelas_base),
+    (2, "Fotos fora do banco (foto_hash)", _fotos_em_disco),
+    (3, "Datas das ocorrências em ISO 8601", migrar_datas_iso),
+    (4, "Índices de status e criado_por", _indices_ocorrencias),
+    (5, "Histórico de mudanças de status", _historico_status),
+    (6, "Índice de apartamento e limite de tentativas de login", _login),
+    (7, "Busca textual (FTS5) em ocorrências e moradores", _busca_textual),
+    (8, "Áreas (categorias) configuráveis", _categorias),
+    (9, "Caixa de saída de notificações", _notificacoes),
+    (10, "Chave inteira em ocorrencias e protocolo com índice único", _chave_inteira),
+]
+VERSAO_ATUAL = MIGRACOES[-1][0]
+
+
+# ====================== EXECUÇÃO ======================
+def versao_atual(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT MAX(versao) FROM schema_version").fetchone()
+    return row[0] or 0
+
+def atualizar_esquema(conn: sqlite3.Connection) -> list:
+    """Aplica as migrações pendentes e devolve os números das versões aplicadas.
+
+    Espera uma conexão em autocommit (``isolation_level=None``), como as do
+    ``condominio.banco``.
+    """
+    conn.execute("""CREATE TABLE IF NOT EXISTS schema_version (
+        versao INTEGER PRIMARY KEY,
+        descricao TEXT,
+        aplicada_em TEXT DEFAULT (datetime('now','localtime'))
+    )""")
+    # Caminho comum: banco já atualizado, só uma leitura
+    if versao_atual(conn) >= VERSAO_ATUAL:
+        return []
+
+    aplicadas = []
+    for versao, descricao, migracao in MIGRACOES:
+        # IMMEDIATE + releitura: outro processo pode ter aplicado a mesma versão enquanto esperávamos
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if versao <= versao_atual(conn):
+                conn.rollback()
+                continue
+            migracao(conn)
+            # Um commit dentro da migração soltaria o lock antes de registrar a versão
+            if not conn.in_transaction:
+                raise RuntimeError(f"A migração {versao} encerrou a transação")
+            conn.execute("INSERT INTO schema_version (versao, descricao) VALUES (?, ?)", (versao, descricao))
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        conn.commit()
+        aplicadas.append(versao)
+    return aplicadas
+
+
+if __name__ == "__main__":
+    # Uso: python -m condominio.esquema condominio_final_v12.db [outro.db ...]
+    for caminho_db in sys.argv[1:] or ["condominio.db"]:
+        conn = sqlite3.connect(caminho_db, isolation_level=None)
+        aplicadas = atualizar_esquema(conn)
+        conn.close()
+        print(f"{caminho_db}: versão {VERSAO_ATUAL}" + (f" (aplicadas: {aplicadas})" if aplicadas else " (já atualizado)"))
@@ -0,0 +1,131 @@
+"""Exportação de ocorrências e moradores em CSV ou XLSX com memória constante.
+
+As linhas saem do SQLite em lotes (``fetchmany``) direto para o arquivo de
+destino; o XLSX usa o modo write-only do openpyxl, que também grava linha a
+linha. Nada é montado em DataFrame.
+"""
+import argparse
+import csv
+import io
+import re
+import sqlite3
+from datetime import datetime
+
+LOTE_EXPORTACAO = 1_000
+
+COLUNAS_OCORRENCIAS = ["id", "tipo_registro", "categoria", "local_detalhado", "descricao", "status",
+                       "data_envio", "data_conclusao", "criado_por"]
+COLUNAS_MORADORES = ["username", "nome_completo", "apartamento", "email", "telefone", "data_cadastro", "ativo"]
+COLUNAS_DATA = {"data_envio", "data_conclusao", "data_cadastro"}
+# Texto que o Excel/LibreOffice avaliaria como fórmula ao abrir o CSV (descrição e local vêm de
+# anônimos): "=" ou "@" no início, ou "+"/"-" seguidos de chamada, DDE ("|") ou referência a outra
+# planilha ("!"). Telefones ("+55 11 ...") e textos como "-5 graus" saem como foram digitados.
+FORMULA_CSV = re.compile(r"[\t\r ]*(?:[=@]|[+-].*[(|!])", re.DOTALL)
+
+
+# ====================== CONSULTAS ======================
+def _linhas(conn: sqlite3.Connection, sql: str, params=()):
+    cur = conn.execute(sql, params)
+    while True:
+        lote = cur.fetchmany(LOTE_EXPORTACAO)
+        if not lote:
+            break
+        yield from lote
+
+def ocorrencias(conn: sqlite3.Connection, status=None, desde=None, ate=None, incluir_foto: bool = False):
+    """Devolve (cabeçalho, linhas) das ocorrências filtradas, mais antigas primeiro.
+
+    ``desde``/``ate`` são datas ISO ("aaaa-mm-dd"); ``ate`` é exclusivo. A
+    referência da foto (``foto_hash``) só entra com ``incluir_foto``.
+    """
+    colunas = COLUNAS_OCORRENCIAS + (["foto_hash"] if incluir_foto else [])
+    condicoes, params = [], []
+    if status:
+        condicoes.append(f"status IN ({', '.join('?' * len(status))})")
+        params += list(status)
+    if desde:
+        condicoes.append("data_envio >= ?")
+        params.append(desde)
+    if ate:
+        condicoes.append("data_envio < ?")
+        params.append(ate)
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    return colunas, _linhas(conn, f"SELECT {', '.join(colunas)} FROM ocorrencias {where} ORDER BY data_envio", params)
+
+def moradores(conn: sqlite3.Connection):
+    return COLUNAS_MORADORES, _linhas(conn, f"""
+        SELECT {', '.join(COLUNAS_MORADORES)} FROM usuarios
+        WHERE role = 'morador'
+        ORDER BY apartamento, nome_completo
+    """)
+
+
+# ====================== FORMATOS ======================
+def _texto_csv(valor):
+    # O apóstrofo no início faz a planilha mostrar o texto como foi digitado, sem avaliar
+    if isinstance(valor, str) and FORMULA_CSV.match(valor):
+        return "'" + valor
+    return valor
+
+def escrever_csv(cabecalho, linhas, destino):
+    """Grava em ``destino`` (arquivo binário) um CSV UTF-8 com BOM, que o Excel abre com acentos."""
+    texto = io.TextIOWrapper(destino, encoding="utf-8-sig", newline="", write_through=True)
+    escritor = csv.writer(texto, delimiter=";")
+    escritor.writerow(cabecalho)
+    escritor.writerows([_texto_csv(valor) for valor in linha] for linha in linhas)
+    texto.detach()
+
+def escrever_xlsx(cabecalho, linhas, destino):
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    indices_data = [i for i, coluna in enumerate(cabecalho) if coluna in COLUNAS_DATA]
+    livro = Workbook(write_only=True)
+    planilha = livro.create_sheet()
+    planilha.append(cabecalho)
+    for linha in linhas:
+        linha = list(linha)
+        for i, valor in enumerate(linha):
+            # No XLSX o tipo da célula é explícito: o openpyxl só faria fórmula do texto com "=",
+            # que aqui vai como célula de texto, sem prefixo, e o valor lido de volta é o digitado
+            if isinstance(valor, str) and valor.startswith("="):
+                celula = WriteOnlyCell(planilha, value=valor)
+                celula.data_type = "s"
+                linha[i] = celula
+        if indices_data:
+            # Datas como datetime para o Excel ordenar e formatar
+            for i in indices_data:
+                try:
+                    linha[i] = datetime.fromisoformat(linha[i]) if linha[i] else None
+                except (TypeError, ValueError):
+                    pass
+        planilha.append(linha)
+    livro.save(destino)
+
+FORMATOS = {
+    "csv": (escrever_csv, "text/csv"),
+    "xlsx": (escrever_xlsx, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+
+if __name__ == "__main__":
+    # Uso: python -m condominio.exportacao ocorrencias saida.xlsx --status Concluído --desde 2025-01-01
+    parser = argparse.ArgumentParser(description="Exporta ocorrências ou moradores em CSV/XLSX.")
+    parser.add_argument("tabela", choices=["ocorrencias", "moradores"])
+    parser.add_argument("saida", help="arquivo de destino; a extensão (.csv/.xlsx) define o formato")
+    parser.add_argument("--db", default="condominio.db")
+    parser.add_argument("--status", action="append")
+    parser.add_argument("--desde")
+    parser.add_argument("--ate")
+    parser.add_argument("--incluir-foto", action="store_true")
+    args = parser.parse_args()
+
+    escrever, _ = FORMATOS[args.saida.rsplit(".", 1)[-1].lower()]
+    conn = sqlite3.connect(args.db)
+    if args.tabela == "ocorrencias":
+        cabecalho, linhas = ocorrencias(conn, args.status, args.desde, args.ate, args.incluir_foto)
+    else:
+        cabecalho, linhas = moradores(conn)
+    with open(args.saida, "wb") as f:
+        escrever(cabecalho, linhas, f)
+    conn.close()
@@ -0,0 +1,77 @@
+"""Página da fila de atendimentos mantida em memória e atualizada por diferença.
+
+A ``FilaAoVivo`` de uma sessão guarda a página que está na tela e a versão
+(``versao_ocorrencias``) em que ela foi lida. Cada ``atualizar`` custa um
+``MAX(id)`` quando nada mudou; quando mudou, lê só os protocolos alterados
+desde a última versão (historico_status é o registro de mudanças) e os
+encaixa na página, buscando do banco apenas as linhas que faltarem para
+completá-la.
+"""
+import sqlite3
+
+import pandas as pd
+
+from condominio.consultas import (TAMANHO_PAGINA, contar_pendentes, linhas_fila, mudancas_desde,
+                                  pagina_pendentes, versao_ocorrencias)
+
+# Mudanças demais de uma vez (ex.: ação em massa) saem mais baratas relendo a página
+LIMITE_INCREMENTAL = 200
+
+
+def _chave(linha) -> tuple:
+    return linha["data_envio"], linha["id"]
+
+
+class FilaAoVivo:
+    def __init__(self, filtros: dict, cursor=None, limite: int = TAMANHO_PAGINA):
+        self.filtros = filtros
+        self.cursor = cursor
+        self.limite = limite
+        self.versao = None
+        self.contagem = {}
+        self.df = None
+        self.proximo = None
+
+    def _recarregar(self, conn: sqlite3.Connection):
+        self.contagem = contar_pendentes(conn, self.filtros)
+        self.df, self.proximo = pagina_pendentes(conn, self.filtros, self.cursor, self.limite)
+
+    def atualizar(self, conn: sqlite3.Connection) -> bool:
+        """Traz a página para a versão atual do banco; devolve se algo mudou."""
+        versao = versao_ocorrencias(conn)
+        if versao == self.versao:
+            return False
+        if self.df is None:
+            self._recarregar(conn)
+            self.versao = versao
+            return True
+
+        alterados = mudancas_desde(conn, self.versao)
+        self.versao = versao
+        if len(alterados) > LIMITE_INCREMENTAL:
+            self._recarregar(conn)
+            return True
+
+        self.contagem = contar_pendentes(conn, self.filtros)
+        # Tira da página tudo o que mudou e devolve o que ainda pertence a ela, com os dados novos
+        df = self.df[~self.df["id"].isin(alterados)]
+        novos = linhas_fila(conn, self.filtros, alterados)
+        if not novos.empty:
+            # A página vai do cursor (exclusivo) até a última linha dela, se houver próxima página
+            dentro = [(self.cursor is None or _chave(linha) < tuple(self.cursor))
+                      and (self.proximo is None or _chave(linha) >= tuple(self.proximo))
+                      for _, linha in novos.iterrows()]
+            df = pd.concat([df, novos[dentro]], ignore_index=True)
+        df = df.sort_values(["data_envio", "id"], ascending=False, ignore_index=True)
+
+        if len(df) > self.limite:
+            df = df.iloc[:self.limite]
+            self.proximo = _chave(df.iloc[-1])
+        elif len(df) < self.limite and self.proximo is not None:
+            # Saíram linhas e há páginas depois: completa com as seguintes, na ordem da fila
+            inicio = _chave(df.iloc[-1]) if len(df) else self.cursor
+            complemento, proximo = pagina_pendentes(conn, self.filtros, inicio, self.limite - len(df))
+            df = pd.concat([df, complemento], ignore_index=True)
+            self.proximo = _chave(df.iloc[-1]) if proximo is not None else None
+        self.df = df
+        return True
@@ -0,0 +1,214 @@
+"""Armazenamento de fotos endereçado por conteúdo (SHA-256) com miniaturas."""
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import os
+import sqlite3
+import sys
+
+from PIL import Image, ImageOps
+
+log = logging.getLogger(__name__)
+
+# ====================== CONFIGURAÇÕES ======================
+FOTOS_DIR = "evidencias"
+# Bancos que referenciam fotos desta pasta, um caminho absoluto por linha: a limpeza de
+# fotos órfãs só pode apagar o que nenhum deles usa
+REGISTRO_BANCOS = "bancos.txt"
+TAMANHO_MINIATURA = (320, 320)
+QUALIDADE_MINIATURA = 80
+LOTE_MIGRACAO = 100
+
+# Upload: o arquivo enviado é normalizado antes de ir para o armazenamento
+TAMANHO_MAX_UPLOAD = 10 * 1024 * 1024  # mesmo limite de server.maxUploadSize em .streamlit/config.toml
+PIXELS_MAX_UPLOAD = 40_000_000
+LADO_MAX_FOTO = 1600
+ORCAMENTO_FOTO = 350 * 1024
+QUALIDADES_FOTO = (85, 75, 65, 55)
+
+
+# ====================== CAMINHOS ======================
+def _caminho(foto_hash: str, nome: str) -> str:
+    # Dois primeiros caracteres do hash como subpasta para não lotar um único diretório
+    return os.path.join(FOTOS_DIR, "blobs", foto_hash[:2], nome)
+
+def caminho_original(foto_hash: str) -> str:
+    return _caminho(foto_hash, foto_hash)
+
+def caminho_miniatura(foto_hash: str) -> str:
+    return _caminho(foto_hash, f"{foto_hash}_mini.jpg")
+
+
+# ====================== ESCRITA / LEITURA ======================
+def _gravar_atomico(caminho: str, conteudo: bytes):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, "wb") as f:
+        f.write(conteudo)
+    os.replace(temporario, caminho)
+
+def _renovar(caminho: str):
+    try:
+        os.utime(caminho)
+    except FileNotFoundError:
+        pass
+
+def gerar_miniatura(conteudo: bytes) -> bytes:
+    with Image.open(io.BytesIO(conteudo)) as img:
+        img = ImageOps.exif_transpose(img)
+        img = img.convert("RGB")
+        img.thumbnail(TAMANHO_MINIATURA)
+        saida = io.BytesIO()
+        img.save(saida, format="JPEG", quality=QUALIDADE_MINIATURA, optimize=True)
+        return saida.getvalue()
+
+def _rgb(img: Image.Image) -> Image.Image:
+    # PNG com transparência: fundo branco em vez do preto que o convert("RGB") deixaria
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        fundo = Image.new("RGB", img.size, "white")
+        fundo.paste(img, mask=img.getchannel("A"))
+        return fundo
+    return img.convert("RGB")
+
+def preparar_foto(conteudo: bytes) -> bytes:
+    """Normaliza uma foto enviada: orientação corrigida, sem EXIF, lado máximo e JPEG compacto.
+
+    Levanta ValueError com uma mensagem para o usuário se o arquivo for grande
+    demais ou não for uma imagem legível.
+    """
+    if len(conteudo) > TAMANHO_MAX_UPLOAD:
+        raise ValueError(f"A foto deve ter no máximo {TAMANHO_MAX_UPLOAD // (1024 * 1024)} MB.")
+    try:
+        with Image.open(io.BytesIO(conteudo)) as img:
+            # Só o cabeçalho foi lido: dimensões absurdas são recusadas antes de decodificar
+            if img.width * img.height > PIXELS_MAX_UPLOAD:
+                raise ValueError("A foto tem resolução grande demais.")
+            img = ImageOps.exif_transpose(img)
+            img = _rgb(img)
+    except (OSError, Image.DecompressionBombError):
+        raise ValueError("O arquivo enviado não é uma imagem válida.")
+
+    img.thumbnail((LADO_MAX_FOTO, LADO_MAX_FOTO))
+    # Qualidade cai em degraus até caber no orçamento; o último degrau vale mesmo acima dele
+    for qualidade in QUALIDADES_FOTO:
+        saida = io.BytesIO()
+        img.save(saida, format="JPEG", quality=qualidade, optimize=True, progressive=True)
+        if saida.tell() <= ORCAMENTO_FOTO:
+            break
+    return saida.getvalue()
+
+def salvar_foto(conteudo: bytes) -> str:
+    """Grava a foto uma única vez (deduplicada pelo SHA-256) e devolve o hash."""
+    foto_hash = hashlib.sha256(conteudo).hexdigest()
+
+    original = caminho_original(foto_hash)
+    if not os.path.exists(original):
+        _gravar_atomico(original, conteudo)
+    else:
+        # Foto repetida: a data renovada a protege da limpeza de órfãs até o registro ser gravado
+        _renovar(original)
+
+    miniatura = caminho_miniatura(foto_hash)
+    if not os.path.exists(miniatura):
+        try:
+            _gravar_atomico(miniatura, gerar_miniatura(conteudo))
+        except (OSError, Image.DecompressionBombError):
+            pass  # Imagem ilegível: fica só o original, exibido sob demanda
+    else:
+        _renovar(miniatura)
+
+    return foto_hash
+
+def ler_foto(foto_hash: str):
+    try:
+        with open(caminho_original(foto_hash), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def tem_miniatura(foto_hash: str) -> bool:
+    return os.path.exists(caminho_miniatura(foto_hash))
+
+
+# ====================== BANCOS DA PASTA ======================
+def registrar_banco(caminho_db: str):
+    """Anota ``caminho_db`` entre os bancos que usam esta pasta de fotos (uma vez só)."""
+    caminho_db = os.path.abspath(caminho_db)
+    if caminho_db in bancos_registrados():
+        return
+    os.makedirs(FOTOS_DIR, exist_ok=True)
+    with open(os.path.join(FOTOS_DIR, REGISTRO_BANCOS), "a", encoding="utf-8") as f:
+        f.write(caminho_db + "\n")
+
+def bancos_registrados() -> set:
+    try:
+        with open(os.path.join(FOTOS_DIR, REGISTRO_BANCOS), encoding="utf-8") as f:
+            return {linha.strip() for linha in f if linha.strip()}
+    except FileNotFoundError:
+        return set()
+
+
+# ====================== MIGRAÇÃO ======================
+def migrar_fotos_base64(conn: sqlite3.Connection) -> int:
+    """Move os valores antigos de ocorrencias.foto_base64 para o armazenamento em disco.
+
+    Não faz commit: roda dentro da transação de quem chama (a migração do
+    esquema ou o comando deste módulo). Valores que não são base64 válido
+    ficam onde estão e vão para o log. Não registra o banco na pasta: isso é
+    de quem abre o banco de verdade (``Servicos.inicializar`` e o comando
+    deste módulo), não de toda migração, que também roda em bancos temporários.
+    """
+    colunas = {c[1] for c in conn.execute("PRAGMA table_info(ocorrencias)")}
+    if "foto_base64" not in colunas:
+        return 0
+    if "foto_hash" not in colunas:
+        conn.execute("ALTER TABLE ocorrencias ADD COLUMN foto_hash TEXT")
+
+    migradas = 0
+    ultimo = 0
+    while True:
+        # Em lotes, para não trazer todas as fotos para a memória de uma vez; pelo rowid,
+        # para que as linhas inválidas deixadas para trás não voltem no lote seguinte
+        lote = conn.execute("""
+            SELECT rowid, id, foto_base64 FROM ocorrencias
+            WHERE foto_base64 IS NOT NULL AND rowid > ?
+            ORDER BY rowid
+            LIMIT ?
+        """, (ultimo, LOTE_MIGRACAO)).fetchall()
+        if not lote:
+            break
+        for ultimo, protocolo, foto_b64 in lote:
+            try:
+                foto_hash = salvar_foto(base64.b64decode(foto_b64)) if foto_b64 else None
+            except (binascii.Error, ValueError) as e:
+                log.warning("Foto do protocolo %s não migrada (base64 inválido: %s)", protocolo, e)
+                continue
+            conn.execute("""
+                UPDATE ocorrencias
+                SET foto_hash = COALESCE(?, foto_hash), foto_base64 = NULL
+                WHERE id = ?
+            """, (foto_hash, protocolo))
+            migradas += 1
+    return migradas
+
+
+if __name__ == "__main__":
+    # Uso: python -m condominio.fotos condominio_final_v12.db [outro.db ...]
+    # Também registra os bancos na pasta de fotos, para a limpeza de órfãs contar com eles
+    for caminho_db in sys.argv[1:] or ["condominio.db"]:
+        registrar_banco(caminho_db)
+        conn = sqlite3.connect(caminho_db)
+        total = migrar_fotos_base64(conn)
+        conn.commit()
+        if total:
+            conn.execute("VACUUM")
+            # O VACUUM pode renumerar os rowids que os índices de busca acompanham
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'ocorrencias_fts'").fetchone():
+                from condominio.busca import reconstruir_indices
+                reconstruir_indices(conn)
+                conn.commit()
+        conn.close()
+        print(f"{caminho_db}: {total} foto(s) migrada(s)")
@@ -0,0 +1,261 @@
+"""Manutenção dos bancos: arquivamento, limpeza de fotos, compactação e backup.
+
+Uso:
+    python -m condominio.manutencao tudo                       (condominio.db)
+    python -m condominio.manutencao --pasta condominios/ tudo  (todos os condomínios)
+    python -m condominio.manutencao arquivar --dias 180
+    python -m condominio.manutencao fotos --simular
+    python -m condominio.manutencao compactar
+    python -m condominio.manutencao backup --destino backups/ --manter 7
+    python -m condominio.manutencao --pasta condominios/ notificacoes
+
+``arquivar`` move as ocorrências concluídas há mais de N dias (padrão: a
+configuração ``arquivar_concluidos_apos_dias``, ou 365) para o arquivo
+comprimido ao lado do banco (ver ``condominio.arquivo``); elas continuam
+aparecendo em "Consultar Protocolo".
+
+``fotos`` apaga do armazenamento as fotos que nenhuma ocorrência, ativa ou
+arquivada, referencia mais (ex.: de chamados excluídos). A pasta de fotos é
+uma só para todos os bancos que rodam no mesmo diretório: entram na conta
+todos os registrados nela (``evidencias/bancos.txt``; cada banco se registra
+ao ser aberto pelo app, pela API ou por ``python -m condominio.fotos``), e a
+limpeza se recusa a rodar se algum deles não for encontrado. Cópias antigas
+que ainda devam manter as fotos precisam ser registradas antes, com
+``python -m condominio.fotos copia.db``. Fotos gravadas há menos de
+``--carencia-dias`` ficam, porque podem ser de um registro ainda sendo
+gravado ou de um backup recente.
+
+``compactar`` devolve ao sistema as páginas livres (VACUUM incremental),
+atualiza as estatísticas do planejador (ANALYZE) e zera o WAL. Na primeira
+vez, um banco sem ``auto_vacuum`` passa por um VACUUM completo para ligá-lo.
+
+``backup`` copia cada banco e o seu arquivo com a API de backup do SQLite,
+com o app no ar, em ``.db.gz`` com data e hora; só os ``--manter`` mais
+recentes de cada banco ficam. As fotos não entram: o armazenamento é por
+conteúdo e só recebe arquivos novos, e pode ser copiado com rsync.
+
+``notificacoes`` esvazia a caixa de saída de cada banco. O despachante do app
+só atende os condomínios abertos nele e a API, por padrão, não despacha: o que
+foi gravado para um condomínio que ninguém abriu no app sai por aqui. O envio
+é o mesmo do app: SMTP pelas variáveis ``CONDOMINIO_SMTP_*`` ou, sem elas, o
+arquivo de cada banco (``--notificacoes``; no modo multicondomínio,
+``<pasta>/<condomínio>.notificacoes.jsonl``).
+
+Todos os comandos podem rodar com o app no ar, mas o VACUUM completo da
+primeira compactação espera as escritas pararem: agende ``tudo`` para a
+madrugada (cron).
+"""
+import argparse
+import glob
+import gzip
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+
+from condominio.arquivo import CHAVE_DIAS_ARQUIVAR, DIAS_ARQUIVAR, arquivar, caminho_arquivo, fotos_arquivadas
+from condominio.banco import BUSY_TIMEOUT_MS, Banco
+from condominio.busca import reconstruir_indices
+from condominio.condominios import CATALOGO, Condominios
+from condominio.configuracoes import Configuracoes
+from condominio.fotos import FOTOS_DIR, REGISTRO_BANCOS, bancos_registrados
+from condominio.notificacoes import Despachante, envio_do_ambiente
+from condominio.servicos import Servicos
+
+CARENCIA_FOTOS_DIAS = 30
+NOTIFICACOES_PATH = "notificacoes.jsonl"
+BACKUPS_DIR = "backups"
+BACKUPS_MANTIDOS = 7
+# Páginas copiadas por passo do backup: entre passos o app pode escrever
+PAGINAS_POR_PASSO = 1024
+
+
+def _conectar(caminho: str) -> sqlite3.Connection:
+    return sqlite3.connect(caminho, isolation_level=None, timeout=BUSY_TIMEOUT_MS / 1000)
+
+def _tamanho(caminho: str) -> int:
+    # O WAL conta: o checkpoint só passa páginas dele para o arquivo principal
+    return sum(os.path.getsize(c) for c in (caminho, f"{caminho}-wal") if os.path.exists(c))
+
+
+# ====================== NOTIFICAÇÕES ======================
+def despachar_pendentes(banco, envio) -> int:
+    """Entrega, em lotes, o que está vencido na caixa de saída; devolve quantas saíram."""
+    despachante = Despachante(banco, envio)
+    total = 0
+    # Um lote que falha fica para a próxima tentativa (com espera crescente) e encerra a rodada
+    while True:
+        entregues = despachante.despachar_lote()
+        if not entregues:
+            return total
+        total += entregues
+
+def _envio(args, caminho_db: str):
+    # Mesmo arquivo que o app usaria para este banco
+    if args.pasta:
+        identificador = os.path.splitext(os.path.basename(caminho_db))[0]
+        return envio_do_ambiente(os.path.join(args.pasta, f"{identificador}.{os.path.basename(args.notificacoes)}"))
+    return envio_do_ambiente(args.notificacoes)
+
+
+# ====================== FOTOS ======================
+def fotos_referenciadas(caminhos_db) -> set:
+    """Hashes de foto usados pelas ocorrências ativas e arquivadas dos bancos dados."""
+    hashes = set()
+    for caminho in caminhos_db:
+        conn = _conectar(caminho)
+        try:
+            hashes.update(row[0] for row in conn.execute(
+                "SELECT DISTINCT foto_hash FROM ocorrencias WHERE foto_hash IS NOT NULL"))
+        finally:
+            conn.close()
+        hashes |= fotos_arquivadas(caminho)
+    return hashes
+
+def limpar_fotos(caminhos_db=(), carencia_dias: int = CARENCIA_FOTOS_DIAS, simular: bool = False):
+    """Apaga originais e miniaturas sem referência; devolve ``(arquivos, bytes)`` liberados.
+
+    Conta as referências de todos os bancos registrados na pasta de fotos, além
+    de ``caminhos_db``; ``ValueError`` se algum deles não existir.
+    """
+    bancos = bancos_registrados() | {os.path.abspath(caminho) for caminho in caminhos_db}
+    if not bancos:
+        raise ValueError(f"Nenhum banco registrado em {os.path.join(FOTOS_DIR, REGISTRO_BANCOS)}")
+    faltando = sorted(caminho for caminho in bancos if not os.path.exists(caminho))
+    if faltando:
+        raise ValueError("Bancos registrados na pasta de fotos não encontrados (restaure-os ou retire-os de "
+                         f"{os.path.join(FOTOS_DIR, REGISTRO_BANCOS)}): {', '.join(faltando)}")
+    referenciadas = fotos_referenciadas(sorted(bancos))
+    limite = time.time() - carencia_dias * 86400
+    arquivos = liberados = 0
+    for caminho in glob.glob(os.path.join(FOTOS_DIR, "blobs", "*", "*")):
+        # Original: <hash>; miniatura: <hash>_mini.jpg; restos de gravação: <nome>.<pid>.tmp
+        foto_hash = os.path.basename(caminho).split("_")[0].split(".")[0]
+        if foto_hash in referenciadas or os.path.getmtime(caminho) > limite:
+            continue
+        arquivos += 1
+        liberados += os.path.getsize(caminho)
+        if not simular:
+            os.remove(caminho)
+    return arquivos, liberados
+
+
+# ====================== COMPACTAÇÃO ======================
+def compactar(caminho: str) -> int:
+    """VACUUM incremental, ANALYZE e checkpoint do WAL; devolve os bytes liberados."""
+    antes = _tamanho(caminho)
+    conn = _conectar(caminho)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # auto_vacuum só muda com um VACUUM completo, uma vez por banco
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            # O VACUUM pode renumerar os rowids que os índices de busca acompanham
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'ocorrencias_fts'").fetchone():
+                conn.execute("BEGIN IMMEDIATE")
+                reconstruir_indices(conn)
+                conn.execute("COMMIT")
+        else:
+            conn.execute("PRAGMA incremental_vacuum")
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+    return antes - _tamanho(caminho)
+
+
+# ====================== BACKUP ======================
+def backup(caminho: str, destino: str = BACKUPS_DIR, manter: int = BACKUPS_MANTIDOS) -> str:
+    """Cópia consistente (API de backup) comprimida em ``destino``; devolve o arquivo gerado."""
+    os.makedirs(destino, exist_ok=True)
+    nome = os.path.splitext(os.path.basename(caminho))[0]
+    final = os.path.join(destino, f"{nome}-{datetime.now():%Y%m%d-%H%M%S}.db.gz")
+    temporario = f"{final}.{os.getpid()}.tmp"
+    fonte, copia = _conectar(caminho), sqlite3.connect(temporario)
+    try:
+        fonte.backup(copia, pages=PAGINAS_POR_PASSO, sleep=0.01)
+    finally:
+        fonte.close()
+        copia.close()
+    with open(temporario, "rb") as entrada, gzip.open(final, "wb") as saida:
+        shutil.copyfileobj(entrada, saida)
+    os.remove(temporario)
+
+    # O nome tem data e hora ordenáveis: os mais antigos ficam no começo. Os dígitos no padrão
+    # separam "torre" de "torre-norte" na mesma pasta
+    padrao = f"{glob.escape(nome)}-{'[0-9]' * 8}-{'[0-9]' * 6}.db.gz"
+    antigos = sorted(glob.glob(os.path.join(destino, padrao)))
+    for velho in antigos[:max(len(antigos) - manter, 0)]:
+        os.remove(velho)
+    return final
+
+
+# ====================== EXECUÇÃO ======================
+def _servicos(args) -> list:
+    """``Servicos`` (sem despachante, com o esquema atualizado) de cada banco a manter."""
+    if args.pasta:
+        condominios = Condominios(args.pasta)
+        return [condominios.servicos(identificador) for identificador, _ in condominios.listar()]
+    banco = Banco(args.db)
+    Servicos(banco).inicializar()
+    return [Servicos(banco, Configuracoes(banco))]
+
+def _mb(tamanho: int) -> str:
+    return f"{tamanho / (1024 * 1024):.1f} MB"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manutenção dos bancos do Condomínio Pro.")
+    parser.add_argument("--db", default="condominio.db")
+    parser.add_argument("--pasta", help="modo multicondomínio: todos os condomínios da pasta")
+    parser.add_argument("--dias", type=int, help=f"arquivar concluídos há mais de DIAS (padrão: config ou {DIAS_ARQUIVAR})")
+    parser.add_argument("--carencia-dias", type=int, default=CARENCIA_FOTOS_DIAS,
+                        help="não apaga fotos gravadas há menos que isso")
+    parser.add_argument("--simular", action="store_true", help="fotos: só conta o que seria apagado")
+    parser.add_argument("--destino", default=BACKUPS_DIR)
+    parser.add_argument("--manter", type=int, default=BACKUPS_MANTIDOS, help="backups mantidos por banco")
+    parser.add_argument("--notificacoes", default=NOTIFICACOES_PATH,
+                        help="arquivo (JSON lines) das notificações, sem SMTP configurado")
+    parser.add_argument("comando", choices=["tudo", "notificacoes", "arquivar", "fotos", "compactar", "backup"])
+    args = parser.parse_args()
+    # Sem o banco, Servicos.inicializar criaria um vazio (com o admin padrão) no lugar
+    if args.pasta and not os.path.exists(os.path.join(args.pasta, CATALOGO)):
+        parser.error(f"{os.path.join(args.pasta, CATALOGO)} não encontrado")
+    if not args.pasta and not os.path.exists(args.db):
+        parser.error(f"{args.db} não encontrado")
+
+    todos = _servicos(args)
+    caminhos = [servicos.banco.caminho for servicos in todos]
+    comandos = (["notificacoes", "arquivar", "fotos", "compactar", "backup"] if args.comando == "tudo"
+                else [args.comando])
+
+    if "notificacoes" in comandos:
+        for servicos in todos:
+            enviadas = despachar_pendentes(servicos.banco, _envio(args, servicos.banco.caminho))
+            print(f"{servicos.banco.caminho}: {enviadas} notificação(ões) enviada(s)")
+    if "arquivar" in comandos:
+        for servicos in todos:
+            dias = args.dias if args.dias is not None else int(servicos.config.obter(CHAVE_DIAS_ARQUIVAR, DIAS_ARQUIVAR))
+            print(f"{servicos.banco.caminho}: {arquivar(servicos.banco, dias)} ocorrência(s) arquivada(s)")
+    for servicos in todos:
+        servicos.fechar()
+
+    if "fotos" in comandos:
+        try:
+            arquivos, liberados = limpar_fotos(caminhos, args.carencia_dias, args.simular)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"fotos: {arquivos} arquivo(s) sem referência, {_mb(liberados)}"
+              + (" (simulação)" if args.simular else " apagados"))
+
+    # O catálogo do modo multicondomínio também entra na compactação e no backup
+    arquivos_db = [c for caminho in caminhos for c in (caminho, caminho_arquivo(caminho)) if os.path.exists(c)]
+    if args.pasta:
+        arquivos_db.append(os.path.join(args.pasta, CATALOGO))
+    if "compactar" in comandos:
+        for caminho in arquivos_db:
+            print(f"{caminho}: {_mb(max(compactar(caminho), 0))} liberados")
+    if "backup" in comandos:
+        for caminho in arquivos_db:
+            print(f"{caminho}: backup em {backup(caminho, args.destino, args.manter)}")
@@ -0,0 +1,181 @@
+"""Notificações de chamados por caixa de saída (tabela notificacoes) e despacho em segundo plano.
+
+``enfileirar`` grava a notificação na mesma transação da abertura ou da mudança
+de status: se a escrita foi confirmada, a notificação existe. Um ``Despachante``
+por processo lê a fila em lotes numa thread própria e entrega pelo ``envio``
+configurado; falhas ficam na fila e são tentadas de novo com espera crescente,
+sem nunca atrasar a página que fez a escrita.
+
+O envio vem do ambiente (``envio_do_ambiente``): com ``CONDOMINIO_SMTP_SERVIDOR``
+definido, e-mail por SMTP; sem ele, um arquivo JSON lines local, com um aviso
+no log de que ninguém está sendo notificado de verdade.
+"""
+import json
+import logging
+import os
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+
+from condominio.datas import agora
+
+log = logging.getLogger(__name__)
+
+# ====================== CONFIGURAÇÕES ======================
+LOTE_ENVIO = 50
+INTERVALO_S = 5
+ESPERA_BASE_S = 10
+ESPERA_MAX_S = 30 * 60
+
+# SMTP pelo ambiente; destinatários separados por vírgula
+VARIAVEL_SMTP_SERVIDOR = "CONDOMINIO_SMTP_SERVIDOR"
+VARIAVEL_SMTP_PORTA = "CONDOMINIO_SMTP_PORTA"
+VARIAVEL_SMTP_REMETENTE = "CONDOMINIO_SMTP_REMETENTE"
+VARIAVEL_SMTP_DESTINATARIOS = "CONDOMINIO_SMTP_DESTINATARIOS"
+VARIAVEL_SMTP_USUARIO = "CONDOMINIO_SMTP_USUARIO"
+VARIAVEL_SMTP_SENHA = "CONDOMINIO_SMTP_SENHA"
+PORTA_SMTP = 587
+
+
+# ====================== FILA ======================
+def enfileirar(conn, notificacoes):
+    """Grava notificações ``(evento, protocolo, dados)``; ``conn`` deve estar numa transação."""
+    conn.executemany("""
+        INSERT INTO notificacoes (evento, ocorrencia_id, conteudo, criada_em, proxima_tentativa)
+        VALUES (?, ?, ?, ?, 0)
+    """, [(evento, protocolo, json.dumps(dados, ensure_ascii=False), agora())
+          for evento, protocolo, dados in notificacoes])
+
+def _pendentes(conn, limite: int) -> list:
+    cur = conn.execute("""
+        SELECT id, evento, ocorrencia_id, conteudo, criada_em, tentativas FROM notificacoes
+        WHERE enviada_em IS NULL AND proxima_tentativa <= ?
+        ORDER BY id
+        LIMIT ?
+    """, (time.time(), limite))
+    colunas = [c[0] for c in cur.description]
+    lote = [dict(zip(colunas, row)) for row in cur.fetchall()]
+    for notificacao in lote:
+        notificacao["conteudo"] = json.loads(notificacao["conteudo"])
+    return lote
+
+
+# ====================== ENVIOS ======================
+def _texto(notificacao: dict) -> str:
+    dados = notificacao["conteudo"]
+    if notificacao["evento"] == "abertura":
+        return f"Novo chamado {notificacao['ocorrencia_id']} ({dados.get('categoria')}): {dados.get('descricao')}"
+    return f"Chamado {notificacao['ocorrencia_id']}: {dados.get('status_anterior')} → {dados.get('status')}"
+
+class EnvioArquivo:
+    """Anexa cada notificação como uma linha JSON num arquivo local (desenvolvimento e testes)."""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+
+    def enviar(self, lote: list):
+        with open(self.caminho, "a", encoding="utf-8") as f:
+            for notificacao in lote:
+                f.write(json.dumps({**notificacao, "texto": _texto(notificacao)}, ensure_ascii=False) + "\n")
+
+class EnvioSMTP:
+    """Um e-mail por lote, com uma linha por notificação."""
+
+    def __init__(self, servidor: str, porta: int, remetente: str, destinatarios, usuario=None, senha=None):
+        self.servidor = servidor
+        self.porta = porta
+        self.remetente = remetente
+        self.destinatarios = list(destinatarios)
+        self.usuario = usuario
+        self.senha = senha
+
+    def enviar(self, lote: list):
+        mensagem = EmailMessage()
+        mensagem["Subject"] = f"Condomínio Pro: {len(lote)} atualização(ões) de chamados"
+        mensagem["From"] = self.remetente
+        mensagem["To"] = ", ".join(self.destinatarios)
+        mensagem.set_content("\n".join(_texto(n) for n in lote))
+        with smtplib.SMTP(self.servidor, self.porta, timeout=30) as smtp:
+            if self.usuario:
+                smtp.starttls()
+                smtp.login(self.usuario, self.senha)
+            smtp.send_message(mensagem)
+
+
+def envio_do_ambiente(arquivo: str):
+    """``EnvioSMTP`` configurado pelas variáveis ``CONDOMINIO_SMTP_*``; sem elas, ``EnvioArquivo(arquivo)``."""
+    servidor = os.environ.get(VARIAVEL_SMTP_SERVIDOR)
+    if not servidor:
+        log.warning("%s não definido: notificações só são gravadas em %s, ninguém é avisado",
+                    VARIAVEL_SMTP_SERVIDOR, arquivo)
+        return EnvioArquivo(arquivo)
+    remetente = os.environ.get(VARIAVEL_SMTP_REMETENTE)
+    destinatarios = [d.strip() for d in os.environ.get(VARIAVEL_SMTP_DESTINATARIOS, "").split(",") if d.strip()]
+    if not remetente or not destinatarios:
+        raise ValueError(f"Com {VARIAVEL_SMTP_SERVIDOR}, defina também {VARIAVEL_SMTP_REMETENTE} "
+                         f"e {VARIAVEL_SMTP_DESTINATARIOS}")
+    return EnvioSMTP(servidor, int(os.environ.get(VARIAVEL_SMTP_PORTA) or PORTA_SMTP), remetente, destinatarios,
+                     os.environ.get(VARIAVEL_SMTP_USUARIO), os.environ.get(VARIAVEL_SMTP_SENHA))
+
+
+# ====================== DESPACHO ======================
+class Despachante:
+    def __init__(self, banco, envio, intervalo: float = INTERVALO_S):
+        self._banco = banco
+        self._envio = envio
+        self._intervalo = intervalo
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, name="despachante-notificacoes", daemon=True)
+
+    def iniciar(self):
+        self._thread.start()
+        return self
+
+    def avisar(self):
+        """Acorda a thread logo após um commit, sem esperar o próximo intervalo."""
+        self._acordar.set()
+
+    def parar(self):
+        self._parar.set()
+        self._acordar.set()
+        self._thread.join()
+
+    def _executar(self):
+        while not self._parar.is_set():
+            try:
+                while self.despachar_lote():
+                    pass
+            except Exception:
+                log.exception("Falha no despacho de notificações")
+            self._acordar.wait(self._intervalo)
+            self._acordar.clear()
+
+    def despachar_lote(self) -> int:
+        """Envia um lote de notificações vencidas e devolve quantas foram entregues."""
+        with self._banco.conexao() as conn:
+            lote = _pendentes(conn, LOTE_ENVIO)
+        if not lote:
+            return 0
+
+        ids = [(n["id"],) for n in lote]
+        try:
+            # Fora de transação: um envio lento não segura o lock de escrita do banco
+            self._envio.enviar(lote)
+        except Exception as erro:
+            log.warning("Envio de %d notificação(ões) falhou: %s", len(lote), erro)
+            with self._banco.transacao() as conn:
+                conn.executemany(f"""
+                    UPDATE notificacoes
+                    SET tentativas = tentativas + 1,
+                        erro = ?,
+                        proxima_tentativa = ? + MIN({ESPERA_BASE_S} * (1 << MIN(tentativas, 16)), {ESPERA_MAX_S})
+                    WHERE id = ?
+                """, [(str(erro), time.time(), i) for (i,) in ids])
+            return 0
+
+        with self._banco.transacao() as conn:
+            conn.executemany("UPDATE notificacoes SET enviada_em = ?, erro = NULL WHERE id = ?",
+                             [(agora(), i) for (i,) in ids])
+        return len(lote)
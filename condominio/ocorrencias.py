@@ -0,0 +1,118 @@
+"""Escritas nas ocorrências, com cada mudança de status registrada em historico_status.
+
+Aberturas e mudanças de status também entram na caixa de saída de notificações,
+na mesma transação.
+
+As funções recebem a conexão de uma transação já aberta (``banco.transacao()``)
+e trabalham sobre listas de protocolos, para que ações em massa sejam um único
+``executemany`` e um único commit.
+"""
+import sqlite3
+
+from condominio.datas import agora
+from condominio.notificacoes import enfileirar
+from condominio.protocolos import gerar_protocolo
+
+STATUS_CONCLUIDO = "Concluído"
+STATUS_EXCLUIDO = "Excluído"
+STATUS_ARQUIVADO = "Arquivado"
+LOTE_PARAMETROS = 500
+
+
+def _por_protocolo(conn: sqlite3.Connection, protocolos, coluna: str) -> dict:
+    protocolos = list(protocolos)
+    valores = {}
+    # Em blocos: versões antigas do SQLite limitam a 999 parâmetros por comando
+    for inicio in range(0, len(protocolos), LOTE_PARAMETROS):
+        bloco = protocolos[inicio:inicio + LOTE_PARAMETROS]
+        valores.update(conn.execute(f"""
+            SELECT id, {coluna} FROM ocorrencias
+            WHERE id IN ({', '.join('?' * len(bloco))})
+        """, bloco).fetchall())
+    return valores
+
+def _status_atuais(conn: sqlite3.Connection, protocolos) -> dict:
+    return _por_protocolo(conn, protocolos, "status")
+
+def _registrar_historico(conn: sqlite3.Connection, transicoes, quando: str, usuario: str):
+    conn.executemany("""
+        INSERT INTO historico_status (ocorrencia_id, status_anterior, status_novo, alterado_em, alterado_por)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(protocolo, anterior, novo, quando, usuario) for protocolo, anterior, novo in transicoes])
+
+
+def abrir_ocorrencia(conn: sqlite3.Connection, tipo: str, categoria: str, local: str,
+                     descricao: str, foto_hash, criado_por: str) -> str:
+    """Grava a ocorrência e devolve o protocolo gerado."""
+    protocolo = gerar_protocolo(conn)
+    data_envio = agora()
+    conn.execute("""
+        INSERT INTO ocorrencias
+        (id, tipo_registro, categoria, local_detalhado, descricao, foto_hash, data_envio, criado_por)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (protocolo, tipo, categoria, local, descricao, foto_hash, data_envio, criado_por))
+    _registrar_historico(conn, [(protocolo, None, "Pendente")], data_envio, criado_por)
+    enfileirar(conn, [("abertura", protocolo, {"tipo_registro": tipo, "categoria": categoria,
+                                               "local": local, "descricao": descricao})])
+    return protocolo
+
+def alterar_status(conn: sqlite3.Connection, protocolos, novo_status: str, usuario: str, quando: str = None):
+    """Muda o status de vários protocolos de uma vez; devolve ``(alterados, recusados)``.
+
+    ``quando`` (ISO 8601, no formato do banco) permite registrar uma conclusão
+    retroativa, por exemplo ao fechar depois os chamados de uma manutenção; por
+    padrão é agora. Protocolos abertos depois de ``quando``, ou todos se
+    ``quando`` estiver no futuro, ficam como estão e voltam em ``recusados``:
+    dariam tempos de resolução negativos nos relatórios.
+    """
+    recusados = []
+    if quando:
+        if quando > agora():
+            return 0, list(protocolos)
+        envios = _por_protocolo(conn, protocolos, "data_envio")
+        recusados = [protocolo for protocolo, envio in envios.items() if envio and envio > quando]
+        protocolos = [protocolo for protocolo in envios if protocolo not in recusados]
+    else:
+        quando = agora()
+    # Protocolos que já estão no status pedido não geram escrita nem histórico
+    transicoes = [(protocolo, anterior, novo_status)
+                  for protocolo, anterior in _status_atuais(conn, protocolos).items()
+                  if anterior != novo_status]
+    if not transicoes:
+        return 0, recusados
+
+    data_conclusao = quando if novo_status == STATUS_CONCLUIDO else None
+    conn.executemany("""
+        UPDATE ocorrencias
+        SET status = ?, data_conclusao = ?
+        WHERE id = ?
+    """, [(novo_status, data_conclusao, protocolo) for protocolo, _, _ in transicoes])
+    _registrar_historico(conn, transicoes, quando, usuario)
+    enfileirar(conn, [("status", protocolo, {"status_anterior": anterior, "status": novo})
+                      for protocolo, anterior, novo in transicoes])
+    return len(transicoes), recusados
+
+def excluir(conn: sqlite3.Connection, protocolos, usuario: str) -> int:
+    # O histórico fica: a exclusão é a última transição registrada
+    transicoes = [(protocolo, anterior, STATUS_EXCLUIDO)
+                  for protocolo, anterior in _status_atuais(conn, protocolos).items()]
+    if not transicoes:
+        return 0
+    conn.executemany("DELETE FROM ocorrencias WHERE id = ?", [(protocolo,) for protocolo, _, _ in transicoes])
+    _registrar_historico(conn, transicoes, agora(), usuario)
+    return len(transicoes)
+
+def retirar_arquivadas(conn: sqlite3.Connection, registros, quando: str, usuario: str) -> list:
+    """Apaga as ocorrências já copiadas para o arquivo e devolve os protocolos apagados.
+
+    Só sai o que continua como foi copiado: um chamado reaberto nesse meio-tempo
+    fica. O histórico dele vai junto para o arquivo; aqui sobra só a transição
+    "Arquivado".
+    """
+    apagados = [registro["id"] for registro in registros
+                if conn.execute("DELETE FROM ocorrencias WHERE id = ? AND status = ? AND data_conclusao = ?",
+                                (registro["id"], registro["status"], registro["data_conclusao"])).rowcount]
+    conn.executemany("DELETE FROM historico_status WHERE ocorrencia_id = ?", [(protocolo,) for protocolo in apagados])
+    _registrar_historico(conn, [(protocolo, STATUS_CONCLUIDO, STATUS_ARQUIVADO) for protocolo in apagados],
+                         quando, usuario)
+    return apagados
@@ -0,0 +1,51 @@
+"""Protocolos das ocorrências: 7 caracteres aleatórios em base32 (Crockford) e um dígito verificador.
+
+O protocolo é sorteado dentro da transação de escrita (BEGIN IMMEDIATE) e
+conferido contra o índice único antes do INSERT, então nunca colide. Ele
+continua aleatório de propósito: a consulta por protocolo é pública e
+protocolos sequenciais permitiriam ler os chamados dos outros. A ordem de
+inserção fica com a chave inteira ``ocorrencias.seq``.
+
+O dígito verificador (Luhn mod 32) detecta qualquer caractere trocado e quase
+todas as inversões de dois vizinhos, antes de ir ao banco.
+"""
+import secrets
+import sqlite3
+
+# Sem I, L, O e U: não se confundem com 1 e 0 na leitura
+ALFABETO = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+TAMANHO_CORPO = 7
+_EQUIVALENTES = str.maketrans({"O": "0", "I": "1", "L": "1", "-": None, " ": None})
+
+
+def _digito(corpo: str) -> str:
+    base = len(ALFABETO)
+    fator, soma = 2, 0
+    for caractere in reversed(corpo):
+        parcela = fator * ALFABETO.index(caractere)
+        soma += parcela // base + parcela % base
+        fator = 1 if fator == 2 else 2
+    return ALFABETO[(base - soma % base) % base]
+
+def gerar_protocolo(conn: sqlite3.Connection) -> str:
+    """Sorteia um protocolo livre; ``conn`` deve estar numa transação de escrita."""
+    while True:
+        corpo = "".join(secrets.choice(ALFABETO) for _ in range(TAMANHO_CORPO))
+        protocolo = corpo + _digito(corpo)
+        if not conn.execute("SELECT 1 FROM ocorrencias WHERE id = ?", (protocolo,)).fetchone():
+            return protocolo
+
+def normalizar(texto: str) -> str:
+    """Forma canônica do que foi digitado: maiúsculas, sem hífen/espaços, O→0 e I/L→1."""
+    return (texto or "").upper().translate(_EQUIVALENTES)
+
+def protocolo_valido(protocolo: str) -> bool:
+    if len(protocolo) != TAMANHO_CORPO + 1 or any(c not in ALFABETO for c in protocolo):
+        return False
+    return _digito(protocolo[:-1]) == protocolo[-1]
+
+def formatar(protocolo: str) -> str:
+    """Protocolo em dois blocos de 4 (ABCD-EFGH) para leitura; a busca aceita com ou sem hífen."""
+    if len(protocolo) == 8:
+        return f"{protocolo[:4]}-{protocolo[4:]}"
+    return protocolo
@@ -0,0 +1,57 @@
+"""Indicadores de tempo de resolução e idade da fila, calculados no SQL e no pandas.
+
+A duração de cada chamado sai pronta do SQLite (``julianday``), em minutos;
+medianas e percentis são agregações vetorizadas do pandas sobre essa coluna.
+"""
+import sqlite3
+from datetime import timedelta
+
+import pandas as pd
+
+from condominio.consultas import STATUS_ABERTOS
+from condominio.datas import formatar_duracao
+
+# Faixas de idade dos chamados em aberto, em dias: (limite superior, rótulo)
+FAIXAS_IDADE = [(1, "< 1 dia"), (3, "1–3 dias"), (7, "3–7 dias"), (30, "7–30 dias")]
+ROTULO_IDADE_MAXIMA = "> 30 dias"
+
+
+def tempos_resolucao(conn: sqlite3.Connection) -> pd.DataFrame:
+    return pd.read_sql_query("""
+        SELECT id, tipo_registro, categoria, data_envio, data_conclusao, criado_por,
+               substr(data_conclusao, 1, 7) AS mes,
+               (julianday(data_conclusao) - julianday(data_envio)) * 1440 AS minutos
+        FROM ocorrencias
+        WHERE status = 'Concluído'
+        ORDER BY data_conclusao DESC
+    """, conn)
+
+def resumo_por(df: pd.DataFrame, coluna: str) -> pd.DataFrame:
+    """Quantidade, mediana e p90 do tempo de resolução (em minutos) por ``coluna``."""
+    grupos = df.dropna(subset=["minutos"]).groupby(coluna)["minutos"]
+    return pd.DataFrame({
+        "chamados": grupos.size(),
+        "mediana": grupos.median(),
+        "p90": grupos.quantile(0.9),
+    }).reset_index()
+
+def idade_fila(conn: sqlite3.Connection) -> pd.DataFrame:
+    """Quantidade de chamados em aberto por faixa de idade."""
+    casos = " ".join(f"WHEN idade < {limite} THEN '{rotulo}'" for limite, rotulo in FAIXAS_IDADE)
+    df = pd.read_sql_query(f"""
+        SELECT CASE {casos} ELSE '{ROTULO_IDADE_MAXIMA}' END AS faixa, COUNT(*) AS chamados
+        FROM (
+            SELECT julianday('now', 'localtime') - julianday(data_envio) AS idade
+            FROM ocorrencias
+            WHERE status IN (?, ?)
+        )
+        GROUP BY faixa
+    """, conn, params=STATUS_ABERTOS)
+    # Todas as faixas na ordem certa, inclusive as vazias
+    ordem = [rotulo for _, rotulo in FAIXAS_IDADE] + [ROTULO_IDADE_MAXIMA]
+    return df.set_index("faixa").reindex(ordem, fill_value=0)
+
+def formatar_minutos(minutos) -> str:
+    if pd.isna(minutos):
+        return "N/A"
+    return formatar_duracao(timedelta(minutes=round(minutos)))
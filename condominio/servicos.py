@@ -0,0 +1,210 @@
+"""Operações do Condomínio Pro usadas pela página Streamlit e pela API HTTP.
+
+Um ``Servicos`` por processo (por condomínio, no modo multicondomínio) junta
+o ``Banco``, as ``Configuracoes`` e, se houver, o ``Despachante`` de
+notificações. Cada método é uma operação inteira: valida, grava numa única
+transação e acorda o despachante. Entrada inválida sai como ``ValueError``
+com a mensagem para mostrar ao usuário.
+"""
+import sqlite3
+from contextlib import nullcontext
+
+import pandas as pd
+
+from condominio.arquivo import buscar_arquivado
+from condominio.autenticacao import autenticar, criar_hash, verificar_senha
+from condominio.configuracoes import CATEGORIAS_PADRAO
+from condominio.consultas import (buscar_protocolo, contar_pendentes, listar_do_morador, listar_historico,
+                                  pagina_pendentes, protocolos_pendentes)
+from condominio.datas import agora, data_banco
+from condominio.esquema import atualizar_esquema
+from condominio.fotos import preparar_foto, registrar_banco, salvar_foto
+from condominio.ocorrencias import abrir_ocorrencia, alterar_status, excluir
+from condominio.protocolos import normalizar
+
+TIPOS_REGISTRO = ["Abertura de Chamado", "Denúncia"]
+OPCOES_STATUS = ["Pendente", "Em Manutenção", "Concluído"]
+ANONIMO = "Anônimo"
+ADMIN_PADRAO = ("admin", "admin123")
+
+
+class Servicos:
+    def __init__(self, banco, config=None, despachante=None):
+        self.banco = banco
+        self.config = config
+        self._despachante = despachante
+
+    def _avisar(self):
+        if self._despachante:
+            self._despachante.avisar()
+
+    def _medir(self, nome: str):
+        diagnostico = self.banco.diagnostico
+        return diagnostico.medir(nome) if diagnostico else nullcontext()
+
+    def inicializar(self, senha_admin: str = None):
+        """Atualiza o esquema, cria o admin padrão se ainda não existir e registra o banco na pasta de fotos.
+
+        O admin criado aqui tem ``senha_admin`` ou, sem ela, a senha de ``ADMIN_PADRAO``.
+        """
+        registrar_banco(self.banco.caminho)
+        with self.banco.conexao() as conn:
+            atualizar_esquema(conn)
+            tem_admin = conn.execute("SELECT 1 FROM usuarios WHERE username = ?", (ADMIN_PADRAO[0],)).fetchone()
+        if not tem_admin:
+            hash_pw, salt = criar_hash(senha_admin or ADMIN_PADRAO[1])
+            with self.banco.transacao() as conn:
+                conn.execute("""
+                    INSERT OR IGNORE INTO usuarios (username, password_hash, salt, role, nome_completo, apartamento)
+                    VALUES (?, ?, ?, 'admin', 'Síndico Principal', 'Admin')
+                """, (ADMIN_PADRAO[0], hash_pw, salt))
+
+    def fechar(self):
+        """Para o despachante e fecha as conexões livres do pool."""
+        if self._despachante:
+            self._despachante.parar()
+        self.banco.fechar()
+
+    def categorias(self) -> list:
+        return self.config.categorias() if self.config else list(CATEGORIAS_PADRAO)
+
+    # ====================== USUÁRIOS ======================
+    def autenticar(self, identificador: str, senha: str, ip=None):
+        """Devolve ``(usuario, espera)`` como ``condominio.autenticacao.autenticar``."""
+        return autenticar(self.banco, identificador, senha, ip)
+
+    def papel_ativo(self, usuario: str):
+        """Papel ('admin'/'morador') de um usuário ativo, ou None se bloqueado ou inexistente."""
+        with self.banco.conexao() as conn:
+            row = conn.execute("SELECT role FROM usuarios WHERE username = ? AND ativo = 1", (usuario,)).fetchone()
+        return row[0] if row else None
+
+    def cadastrar_morador(self, usuario: str, senha: str, nome: str, apartamento: str, email: str, telefone=None):
+        if not all([nome, apartamento, email, usuario, senha]):
+            raise ValueError("Preencha os campos obrigatórios")
+        hash_pw, salt = criar_hash(senha)
+        try:
+            with self.banco.transacao() as conn:
+                conn.execute("""
+                    INSERT INTO usuarios
+                    (username, password_hash, salt, role, nome_completo, apartamento, email, telefone)
+                    VALUES (?, ?, ?, 'morador', ?, ?, ?, ?)
+                """, (usuario, hash_pw, salt, nome, apartamento, email, telefone or None))
+        except sqlite3.IntegrityError:
+            raise ValueError("Usuário, e-mail ou apartamento já cadastrado.") from None
+
+    def criar_admin(self, usuario: str, senha: str):
+        if not usuario or not senha:
+            raise ValueError("Preencha usuário e senha")
+        hash_senha, salt = criar_hash(senha)
+        try:
+            with self.banco.transacao() as conn:
+                conn.execute("""
+                    INSERT INTO usuarios (username, password_hash, salt, role, nome_completo)
+                    VALUES (?, ?, ?, 'admin', 'Administrador')
+                """, (usuario, hash_senha, salt))
+        except sqlite3.IntegrityError:
+            raise ValueError("Usuário já existe.") from None
+
+    def alterar_senha(self, usuario: str, senha_atual: str, nova_senha: str) -> bool:
+        """Troca a senha se ``senha_atual`` conferir; devolve False se não conferir."""
+        with self.banco.conexao() as conn:
+            row = conn.execute("SELECT password_hash, salt FROM usuarios WHERE username = ?", (usuario,)).fetchone()
+        if not row or not verificar_senha(senha_atual, row[0], row[1]):
+            return False
+        novo_hash, novo_salt = criar_hash(nova_senha)
+        with self.banco.transacao() as conn:
+            conn.execute("UPDATE usuarios SET password_hash = ?, salt = ? WHERE username = ?",
+                         (novo_hash, novo_salt, usuario))
+        return True
+
+    def listar_moradores(self) -> pd.DataFrame:
+        with self.banco.conexao() as conn:
+            return pd.read_sql_query("""
+                SELECT username, nome_completo, apartamento, email, telefone, data_cadastro, ativo
+                FROM usuarios
+                WHERE role = 'morador'
+                ORDER BY data_cadastro DESC
+            """, conn)
+
+    def definir_ativo(self, usuario: str, ativo: bool):
+        with self.banco.transacao() as conn:
+            conn.execute("UPDATE usuarios SET ativo = ? WHERE username = ?", (int(ativo), usuario))
+
+    def excluir_usuario(self, usuario: str):
+        with self.banco.transacao() as conn:
+            conn.execute("DELETE FROM usuarios WHERE username = ?", (usuario,))
+
+    # ====================== OCORRÊNCIAS ======================
+    def abrir(self, tipo: str, categoria: str, local: str, descricao: str, foto: bytes = None,
+              criado_por: str = ANONIMO) -> str:
+        """Valida, guarda a foto (já reduzida) e grava a ocorrência; devolve o protocolo."""
+        if tipo not in TIPOS_REGISTRO:
+            raise ValueError("Tipo de registro inválido")
+        if categoria not in self.categorias():
+            raise ValueError("Área inválida")
+        if not (descricao or "").strip():
+            raise ValueError("A descrição é obrigatória")
+
+        foto_hash = None
+        if foto:
+            # A foto é validada e reduzida antes de qualquer gravação
+            with self._medir("foto: preparar"):
+                foto_hash = salvar_foto(preparar_foto(foto))
+
+        with self.banco.transacao() as conn:
+            protocolo = abrir_ocorrencia(conn, tipo, categoria, local, descricao, foto_hash, criado_por or ANONIMO)
+        self._avisar()
+        return protocolo
+
+    def consultar(self, protocolo: str):
+        """Ocorrência com o histórico de status, ou None; aceita o protocolo como foi digitado.
+
+        Não achando no banco de trabalho, procura entre as arquivadas (``arquivado`` = True).
+        """
+        protocolo = normalizar(protocolo)
+        with self.banco.conexao() as conn:
+            registro = buscar_protocolo(conn, protocolo)
+            if registro is not None:
+                registro["historico"] = listar_historico(conn, protocolo)
+        return registro if registro is not None else buscar_arquivado(self.banco.caminho, protocolo)
+
+    def fila(self, filtros: dict, cursor=None):
+        """Contagem por status e uma página da fila: ``(contagem, df, proximo_cursor)``."""
+        with self.banco.conexao() as conn:
+            contagem = contar_pendentes(conn, filtros)
+            df, proximo = pagina_pendentes(conn, filtros, cursor)
+        return contagem, df, proximo
+
+    def atualizar_fila(self, fila) -> bool:
+        """Traz uma ``FilaAoVivo`` para a versão atual; quase de graça quando nada mudou."""
+        with self.banco.conexao() as conn:
+            return fila.atualizar(conn)
+
+    def do_morador(self, usuario: str) -> pd.DataFrame:
+        with self.banco.conexao() as conn:
+            return listar_do_morador(conn, usuario)
+
+    def alterar_status(self, protocolos, novo_status: str, usuario: str, quando: str = None,
+                       filtros: dict = None):
+        """Muda o status dos protocolos, ou de toda a fila de ``filtros``; devolve ``(alterados, recusados)``.
+
+        ``quando`` vem em ISO 8601 e é gravado no formato do banco, para ordenar junto com as demais datas.
+        Não pode estar no futuro; os protocolos abertos depois dele voltam em ``recusados``.
+        """
+        if novo_status not in OPCOES_STATUS:
+            raise ValueError("Status inválido")
+        if quando is not None:
+            quando = data_banco(quando)
+            if quando > agora():
+                raise ValueError("A data da mudança não pode estar no futuro")
+        with self.banco.transacao() as conn:
+            alvos = protocolos_pendentes(conn, filtros) if filtros is not None else protocolos
+            alterados, recusados = alterar_status(conn, alvos, novo_status, usuario, quando)
+        self._avisar()
+        return alterados, recusados
+
+    def excluir(self, protocolos, usuario: str, filtros: dict = None) -> int:
+        with self.banco.transacao() as conn:
+            alvos = protocolos_pendentes(conn, filtros) if filtros is not None else protocolos
+            return excluir(conn, alvos, usuario)